@@ -2,4 +2,43 @@ import os
 from dotenv import load_dotenv
 
 load_dotenv()
-BOT_TOKEN = os.getenv("TELEGRAM_TOKEN")
\ No newline at end of file
+BOT_TOKEN = os.getenv("TELEGRAM_TOKEN")
+# Jumlah proses worker untuk pekerjaan berat (parse/tulis file). 0 = pakai thread biasa.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", os.cpu_count() or 2))
+
+# Batas proses file yang berjalan bersamaan (global dan per user)
+JOB_MAX_ACTIVE = int(os.getenv("JOB_MAX_ACTIVE", max(JOB_WORKERS, 1) * 2))
+JOB_MAX_PER_USER = int(os.getenv("JOB_MAX_PER_USER", 1))
+# Batas parsing awal file upload (antrian terpisah dari proses /done), global dan per user
+PARSE_MAX_ACTIVE = int(os.getenv("PARSE_MAX_ACTIVE", max(JOB_WORKERS, 1)))
+PARSE_MAX_PER_USER = int(os.getenv("PARSE_MAX_PER_USER", 1))
+# Jumlah download file Telegram yang berjalan bersamaan (semua user)
+DOWNLOAD_CONCURRENCY = int(os.getenv("DOWNLOAD_CONCURRENCY", 8))
+# Jumlah part hasil yang boleh disiapkan lebih dulu selagi part sebelumnya diupload
+PIPELINE_DEPTH = int(os.getenv("PIPELINE_DEPTH", 4))
+# Output lebih kecil dari ini (byte) dikirim langsung dari memori tanpa file sementara
+SEND_MEMORY_LIMIT = int(os.getenv("SEND_MEMORY_LIMIT", 8 * 1024 * 1024))
+
+# Storage FSM: "sqlite" (default), "redis" atau "memory"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite")
+STORAGE_PATH = os.getenv("STORAGE_PATH", os.path.join("managemen", "fsm_state.db"))
+# Sesi yang tidak aktif lebih lama dari ini (detik) dihapus
+STORAGE_TTL = int(os.getenv("STORAGE_TTL", 24 * 60 * 60))
+# Perubahan state ditulis ke database per batch tiap interval ini (detik)
+STORAGE_FLUSH_INTERVAL = float(os.getenv("STORAGE_FLUSH_INTERVAL", 1.0))
+# Dipakai jika STORAGE_BACKEND=redis; paket redis opsional, install terpisah: pip install redis
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# User baru ditulis ke message.txt / user_log.txt per batch tiap interval ini (detik)
+REGISTRY_FLUSH_INTERVAL = float(os.getenv("REGISTRY_FLUSH_INTERVAL", 2.0))
+# Broadcast /message: batas pesan per detik, jumlah kiriman paralel, interval update progress (detik)
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", 25))
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", 10))
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv("BROADCAST_PROGRESS_INTERVAL", 5))
+# Cache cek membership grup/channel (detik); hasil belum join di-cache lebih singkat
+MEMBERSHIP_CACHE_TTL = int(os.getenv("MEMBERSHIP_CACHE_TTL", 600))
+MEMBERSHIP_NEGATIVE_TTL = int(os.getenv("MEMBERSHIP_NEGATIVE_TTL", 30))
+# Folder blocklist nomor per user (file biner uint64 terurut)
+BLOCKLIST_DIR = os.getenv("BLOCKLIST_DIR", os.path.join("managemen", "blocklist"))
+# Cache hasil parsing upload (per isi file / file_unique_id), batas total ukuran (byte)
+PARSE_CACHE_DIR = os.getenv("PARSE_CACHE_DIR", os.path.join("managemen", "parse_cache"))
+PARSE_CACHE_MAX_BYTES = int(os.getenv("PARSE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
@@ -1,19 +1,20 @@
 import logging
 import os
-import time
-import aiofiles
 import asyncio
 from aiogram import Router, types, F, Bot
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.filters import Command
-from utils.file import extract_numbers
-from utils.number_cleaner import extract_valid_numbers_from_lines
+from utils.file import extract_unique_numbers
+from utils.format import write_vcf, write_chunked
+from utils.executor import run_job
+from utils.output import SpooledOutput
+from utils.scheduler import run_queued
+from utils.upload import receive_upload, mark_file_error
+from utils.number_cleaner import extract_valid_numbers_from_lines, PackedNumbers
 from utils.retry_send import retry_send_document
-from managemen.membership import check_membership, send_membership_message, delete_join_message
-from managemen.status import save_user
+from utils.vcard import iter_vcards
 from managemen.data_file import log_file_upload
-from managemen.message import save_user_for_broadcast
 
 router = Router()
 
@@ -40,13 +41,6 @@ async def add_global(message: types.Message, state: FSMContext):
     await add_start(message, state)
 
 async def add_start(message: types.Message, state: FSMContext):
-    save_user_for_broadcast(message.from_user)
-    save_user(message.from_user.username)
-    in_group, in_channel = await check_membership(message.bot, message.from_user.id)
-    if not (in_group and in_channel):
-        await send_membership_message(message, in_group, in_channel)
-        return
-    await delete_join_message(message.bot, message.from_user.id, message.chat.id)
     log_user(message)
     bot_msg = "📥 Kirim file yang ingin ditambah nomor"
     await message.answer(bot_msg)
@@ -68,26 +62,15 @@ async def add_receive_file(message: types.Message, state: FSMContext, bot: Bot):
         return
 
     if ext not in allowed_ext:
-        await state.update_data(files=[], logs=[], file_error=True)
+        await mark_file_error(state)
         bot_msg = "❌ Format file tidak didukung!\nKetik /add untuk mulai ulang."
         await message.answer(bot_msg)
         log_bot(bot_msg)
         return
 
     try:
-        files = data.get("files", [])
-        logs = data.get("logs", [])
-        filename, ext_real = os.path.splitext(file.file_name)
-        timestamp = int(time.time() * 1000)
-        unique_name = f"{filename}_{timestamp}{ext_real}"
-        file_path = os.path.join(DATA_DIR, unique_name)
-        await bot.download(file, destination=file_path)
-        files.append((file_path, file.file_name, message.message_id))
-        logs.append((message.message_id, f"bot: File {file.file_name} diterima"))
-        await state.update_data(files=files, logs=logs)
-        state_now = await state.get_data()
-        # Pesan /done hanya muncul jika ini file valid pertama DAN tidak ada file_error di state
-        if len(state_now.get("files", [])) == 1 and not state_now.get("file_error"):
+        total = await receive_upload(message, state, bot)
+        if total == 1:
             bot_msg = "✅ File diterima. Ketik /done untuk lanjut."
             await message.answer(bot_msg)
             log_bot(bot_msg)
@@ -169,7 +152,7 @@ async def add_receive_numbers(message: types.Message, state: FSMContext):
         await state.set_state(AddStates.waiting_contact_name)
     else:
         # Tidak ada file .vcf, langsung proses
-        await process_add(message, state)
+        await run_queued(message, process_add, message, state)
 
 @router.message(AddStates.waiting_contact_name, F.chat.type == "private")
 async def add_receive_contact_name(message: types.Message, state: FSMContext):
@@ -186,7 +169,43 @@ async def add_receive_contact_name(message: types.Message, state: FSMContext):
         log_bot(bot_msg)
         return
     await state.update_data(add_contact_name=contact_name)
-    await process_add(message, state)
+    await run_queued(message, process_add, message, state)
+
+def add_numbers_file(file_path, ext, output_path, add_numbers, add_contact_name):
+    """Tambah nomor baru ke satu file dan tulis hasilnya (dijalankan di job executor). Return isi output atau path."""
+    # Ekstrak nomor lama dan nama kontak lama (khusus vcf)
+    old_numbers = extract_unique_numbers(file_path)
+    new_numbers = PackedNumbers.from_iter(add_numbers)
+    # Nomor lama yang juga ada di nomor baru cukup ditulis sekali (di atas)
+    added = old_numbers.isin(new_numbers)
+    all_numbers = PackedNumbers.concat(new_numbers, old_numbers.select(~added))
+
+    # --- Penamaan kontak ---
+    contact_names = []
+    # Untuk file VCF, ambil nama kontak lama dari file user
+    old_contact_names = []
+    if ext == ".vcf":
+        # Ambil nama kontak lama dari file VCF
+        old_contact_names = extract_vcf_names(file_path)
+    # Nomor baru diberi nama baru, sisanya pakai nama lama (atau default jika tidak ada)
+    for i in range(len(add_numbers)):
+        contact_names.append(f"{add_contact_name} {i+1:02d}")
+    for i in (~added).nonzero()[0].tolist():
+        if ext == ".vcf" and i < len(old_contact_names):
+            contact_names.append(old_contact_names[i])
+        else:
+            contact_names.append(f"Kontak {i+1+len(add_numbers):02d}")
+
+    if ext == ".vcf":
+        return write_vcf(output_path, contact_names, all_numbers)
+    out = SpooledOutput(output_path)
+    if ext in [".xlsx", ".xls"]:
+        import pandas as pd
+        df = pd.DataFrame({"Nomor": all_numbers.tolist()})
+        df.to_excel(out, index=False)
+    else:
+        write_chunked(out, all_numbers)
+    return out.result()
 
 async def process_add(message: types.Message, state: FSMContext):
     data = await state.get_data()
@@ -197,47 +216,12 @@ async def process_add(message: types.Message, state: FSMContext):
     try:
         for file_path, original_filename, _ in files:
             logging.info(f"user: proses file {os.path.basename(file_path)}")
-            # Ekstrak nomor lama dan nama kontak lama (khusus vcf)
             _, ext = os.path.splitext(original_filename.lower())
-            old_numbers = await extract_numbers(file_path)
-            old_numbers = list(dict.fromkeys(old_numbers))
-            all_numbers = add_numbers + [n for n in old_numbers if n not in add_numbers]
-
-            # --- Penamaan kontak ---
-            contact_names = []
-            # Untuk file VCF, ambil nama kontak lama dari file user
-            old_contact_names = []
-            if ext == ".vcf":
-                # Ambil nama kontak lama dari file VCF
-                old_contact_names = await extract_vcf_names(file_path)
-            # Nomor baru diberi nama baru, sisanya pakai nama lama (atau default jika tidak ada)
-            for i in range(len(add_numbers)):
-                contact_names.append(f"{add_contact_name} {i+1:02d}")
-            for i, nomor in enumerate(old_numbers):
-                if nomor in add_numbers:
-                    continue  # Sudah di atas
-                if ext == ".vcf" and i < len(old_contact_names):
-                    contact_names.append(old_contact_names[i])
-                else:
-                    contact_names.append(f"Kontak {i+1+len(add_numbers):02d}")
-
             # Format file output sesuai ekstensi input
             output_name = original_filename
             output_path = os.path.join(DATA_DIR, output_name)
-            if ext == ".vcf":
-                vcf_content = create_vcf_content(contact_names, all_numbers)
-                await write_vcf_file(output_path, vcf_content)
-            elif ext in [".txt", ".csv"]:
-                async with aiofiles.open(output_path, "w", encoding="utf-8") as f:
-                    await f.write("\n".join(all_numbers))
-            elif ext in [".xlsx", ".xls"]:
-                import pandas as pd
-                df = pd.DataFrame({"Nomor": all_numbers})
-                df.to_excel(output_path, index=False)
-            else:
-                async with aiofiles.open(output_path, "w", encoding="utf-8") as f:
-                    await f.write("\n".join(all_numbers))
-            await retry_send_document(message, output_path, output_name)
+            output = await run_job(add_numbers_file, file_path, ext, output_path, add_numbers, add_contact_name)
+            await retry_send_document(message, output, output_name)
             log_bot(f"kirim file {output_name}")
             file_paths_to_delete.append(output_path)
         bot_msg = "📤 File berhasil dikirim!"
@@ -260,39 +244,13 @@ async def process_add(message: types.Message, state: FSMContext):
         await state.clear()
 
 # Tambahkan fungsi ini di bawah process_add:
-async def extract_vcf_names(file_path):
+def extract_vcf_names(file_path):
     """Ambil nama kontak dari file VCF, urut sesuai urutan nomor."""
     names = []
     try:
-        async with aiofiles.open(file_path, "r", encoding="utf-8") as f:
-            content = await f.read()
-        cards = content.split("BEGIN:VCARD")
-        for card in cards:
-            if "FN:" in card:
-                name_line = [line for line in card.splitlines() if line.startswith("FN:")]
-                if name_line:
-                    names.append(name_line[0][3:].strip())
+        for card in iter_vcards(file_path):
+            if card.fn is not None:
+                names.append(card.fn)
     except Exception as e:
         logging.error(f"extract_vcf_names error: {e}")
     return names
-
-# --- Fungsi pendukung ---
-def create_vcf_content(contact_names, numbers):
-    vcf_entries = []
-    for name, number in zip(contact_names, numbers):
-        vcf_entries.append(
-            f"BEGIN:VCARD\nVERSION:3.0\nFN:{name}\nTEL;TYPE=CELL:{number}\nEND:VCARD"
-        )
-    return "\n".join(vcf_entries)
-
-async def write_vcf_file(output_path, vcf_content, max_retry=3, delay=2):
-    for attempt in range(1, max_retry + 1):
-        try:
-            async with aiofiles.open(output_path, "w", encoding="utf-8") as f:
-                await f.write(vcf_content)
-            return True
-        except Exception as e:
-            logging.error(f"Error writing vcf: {e} (percobaan {attempt})")
-            if attempt == max_retry:
-                raise
-            await asyncio.sleep(delay)
@@ -0,0 +1,145 @@
+import asyncio
+import contextlib
+import logging
+import os
+from aiogram import Router, types, F, Bot
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import StatesGroup, State
+from aiogram.filters import Command
+from utils.number_cleaner import extract_valid_numbers_from_lines, PackedNumbers
+from utils.file import extract_unique_numbers
+from utils.executor import run_job
+from utils.upload import download_document
+from utils.blocklist import blocklist_size, add_to_blocklist, remove_from_blocklist, clear_blocklist
+from managemen.data_file import log_file_upload
+
+router = Router()
+
+class BlocklistStates(StatesGroup):
+    waiting_add = State()
+    waiting_remove = State()
+
+# Perubahan blocklist satu user dijalankan berurutan supaya tidak saling timpa.
+# user_id -> [lock, jumlah pemakai]; entry dibuang begitu tidak ada yang memegang / menunggu lock.
+_user_locks = {}
+
+USAGE = (
+    "🚫 Blocklist: nomor di sini otomatis dibuang di /to_vcf, /nodup dan /delete.\n"
+    "Jumlah nomor di blocklist kamu: {total}\n\n"
+    "/blocklist tambah - tambah nomor\n"
+    "/blocklist hapus - hapus nomor dari blocklist\n"
+    "/blocklist kosongkan - hapus semua nomor"
+)
+
+def log_user(message: types.Message):
+    if getattr(message, "document", None):
+        logging.info(f"user: kirim file {message.document.file_name}")
+    else:
+        logging.info(f"user: {message.text}")
+
+def log_bot(text: str):
+    logging.info(f"bot: {text}")
+
+@contextlib.asynccontextmanager
+async def _user_lock(user_id):
+    entry = _user_locks.get(user_id)
+    if entry is None:
+        entry = _user_locks[user_id] = [asyncio.Lock(), 0]
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            del _user_locks[user_id]
+
+@router.message(Command("blocklist"), F.chat.type == "private")
+async def blocklist_global(message: types.Message, state: FSMContext):
+    await state.clear()
+    log_user(message)
+    user_id = message.from_user.id
+    args = (message.text or "").split()[1:]
+    action = args[0].lower() if args else ""
+    if action == "tambah":
+        bot_msg = "📝 Kirim nomor yang mau diblokir (satu per baris) atau file daftar nomor (.txt/.csv/.xlsx/.vcf):"
+        await state.set_state(BlocklistStates.waiting_add)
+    elif action == "hapus":
+        bot_msg = "📝 Kirim nomor yang mau dihapus dari blocklist (satu per baris) atau file daftar nomor:"
+        await state.set_state(BlocklistStates.waiting_remove)
+    elif action == "kosongkan":
+        async with _user_lock(user_id):
+            await run_job(clear_blocklist, user_id)
+        bot_msg = "✅ Blocklist dikosongkan."
+    else:
+        bot_msg = USAGE.format(total=blocklist_size(user_id))
+    await message.answer(bot_msg)
+    log_bot(bot_msg)
+
+async def update_blocklist(message: types.Message, state: FSMContext, numbers):
+    user_id = message.from_user.id
+    adding = await state.get_state() == BlocklistStates.waiting_add.state
+    async with _user_lock(user_id):
+        if adding:
+            changed, total = await run_job(add_to_blocklist, user_id, numbers)
+            bot_msg = f"✅ {changed} nomor baru diblokir. Total blocklist: {total} nomor."
+        else:
+            changed, total = await run_job(remove_from_blocklist, user_id, numbers)
+            bot_msg = f"✅ {changed} nomor dihapus dari blocklist. Total blocklist: {total} nomor."
+    await message.answer(bot_msg)
+    log_bot(bot_msg)
+    await state.clear()
+
+@router.message(BlocklistStates.waiting_add, F.document, F.chat.type == "private")
+@router.message(BlocklistStates.waiting_remove, F.document, F.chat.type == "private")
+async def blocklist_receive_file(message: types.Message, state: FSMContext, bot: Bot):
+    log_user(message)
+    await log_file_upload(message)
+    _, ext = os.path.splitext(message.document.file_name.lower())
+    if ext not in [".txt", ".xlsx", ".xls", ".vcf", ".csv"]:
+        bot_msg = "❌ Format file tidak didukung! Kirim file .txt/.csv/.xlsx/.vcf atau ketik nomornya."
+        await message.answer(bot_msg)
+        log_bot(bot_msg)
+        return
+    file_path = None
+    try:
+        file_path = await download_document(message, bot)
+        numbers = await run_job(extract_unique_numbers, file_path)
+        if not numbers:
+            bot_msg = "⚠️ Tidak ada nomor valid di file. Kirim ulang atau ketik nomornya."
+            await message.answer(bot_msg)
+            log_bot(bot_msg)
+            return
+        await update_blocklist(message, state, numbers)
+    except Exception as e:
+        err_msg = f"❌ Gagal update blocklist. Ketik /blocklist untuk ulang.\n{e}"
+        logging.error(err_msg)
+        log_bot(err_msg)
+        await message.answer(err_msg)
+        await state.clear()
+    finally:
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
+
+@router.message(BlocklistStates.waiting_add, F.chat.type == "private")
+@router.message(BlocklistStates.waiting_remove, F.chat.type == "private")
+async def blocklist_receive_numbers(message: types.Message, state: FSMContext):
+    if not message.text or message.text.strip().startswith("/"):
+        await state.clear()
+        await router.emit(message)
+        return
+    log_user(message)
+    numbers = extract_valid_numbers_from_lines(message.text.strip().splitlines())
+    if not numbers:
+        bot_msg = "Nomor tidak valid. Masukkan ulang nomor (pisahkan per baris):"
+        await message.answer(bot_msg)
+        log_bot(bot_msg)
+        return
+    try:
+        await update_blocklist(message, state, PackedNumbers.from_iter(numbers))
+    except Exception as e:
+        err_msg = f"❌ Gagal update blocklist. Ketik /blocklist untuk ulang.\n{e}"
+        logging.error(err_msg)
+        log_bot(err_msg)
+        await message.answer(err_msg)
+        await state.clear()
@@ -1,16 +1,18 @@
 import logging
 import os
-import aiofiles
 import asyncio
 from aiogram import Router, types, F, Bot
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.filters import Command
 from utils.retry_send import retry_send_document
-from managemen.membership import check_membership, send_membership_message, delete_join_message
-from managemen.status import save_user
+from utils.executor import run_job
+from utils.file import line_parser
+from utils.scheduler import run_queued
+from utils.upload import receive_upload, mark_file_error, take_parsed, discard_parsed, is_cached
+from utils.spreadsheet import count_sheet_rows
+from utils.records import count_records, count_tel_lines
 from managemen.data_file import log_file_upload
-from managemen.message import save_user_for_broadcast
 
 router = Router()
 DATA_DIR = "data"
@@ -28,78 +30,32 @@ def log_user(message: types.Message):
 def log_bot(text: str):
     logging.info(f"bot: {text}")
 
-def clean_and_validate_number(line):
-    import re
-    line = line.strip()
-    if not line:
-        return None
-    if line.startswith("+"):
-        nomor = "+" + re.sub(r"[^\d]", "", line[1:])
-    else:
-        nomor = re.sub(r"[^\d]", "", line)
-        nomor = "+" + nomor
-    digit_count = len(re.sub(r"[^\d]", "", nomor))
-    if digit_count < 8:
-        return None
-    return nomor
-
-async def extract_numbers_from_file(file_path, ext):
-    numbers = []
+def fast_count_file(file_path, ext):
+    """
+    Hitung cepat tanpa validasi nomor (dijalankan di job executor): baris TEL (.vcf),
+    baris (.txt/.csv) atau baris data sheet pertama (.xlsx/.xls).
+    """
     if ext == ".vcf":
-        async with aiofiles.open(file_path, "r", encoding="utf-8") as f:
-            content = await f.read()
-        cards = content.split("BEGIN:VCARD")
-        for card in cards:
-            card = card.strip()
-            if not card:
-                continue
-            for line in card.splitlines():
-                if line.strip().startswith("TEL"):
-                    nomor = line.split(":")[-1].strip()
-                    nomor_bersih = clean_and_validate_number(nomor)
-                    if nomor_bersih:
-                        numbers.append(nomor_bersih)
-    elif ext in [".txt", ".csv"]:
-        async with aiofiles.open(file_path, "r", encoding="utf-8") as f:
-            lines = await f.readlines()
-        for line in lines:
-            nomor = clean_and_validate_number(line)
-            if nomor:
-                numbers.append(nomor)
-    elif ext in [".xlsx", ".xls"]:
-        import pandas as pd
-        df = pd.read_excel(file_path)
-        for col in df.columns:
-            for val in df[col]:
-                nomor = clean_and_validate_number(str(val))
-                if nomor:
-                    numbers.append(nomor)
-    else:
-        # Format lain: treat as txt
-        async with aiofiles.open(file_path, "r", encoding="utf-8") as f:
-            lines = await f.readlines()
-        for line in lines:
-            nomor = clean_and_validate_number(line)
-            if nomor:
-                numbers.append(nomor)
-    return numbers
+        return count_tel_lines(file_path)
+    if ext in [".xlsx", ".xls"]:
+        return count_sheet_rows(file_path)
+    return count_records(file_path, ext)
 
 @router.message(Command("count"), F.chat.type == "private")
 async def count_global(message: types.Message, state: FSMContext):
     await state.clear()
-    save_user_for_broadcast(message.from_user)
-    save_user(message.from_user.username)
-    in_group, in_channel = await check_membership(message.bot, message.from_user.id)
-    if not (in_group and in_channel):
-        await send_membership_message(message, in_group, in_channel)
-        return
-    await delete_join_message(message.bot, message.from_user.id, message.chat.id)
     log_user(message)
-    bot_msg = "📎 Kirim file yang mau dihitung kontaknya."
+    # /count exact: hitung nomor valid (lebih lambat), default hitung cepat tanpa validasi
+    args = (message.text or "").split()[1:]
+    exact = bool(args) and args[0].lower() == "exact"
+    if exact:
+        bot_msg = "📎 Kirim file yang mau dihitung kontaknya.\n✔️ Mode exact: hanya nomor valid yang dihitung."
+    else:
+        bot_msg = "📎 Kirim file yang mau dihitung kontaknya.\nKetik /count exact untuk hitung nomor valid saja."
     await message.answer(bot_msg)
     log_bot(bot_msg)
     await state.set_state(CountStates.waiting_files)
-    await state.update_data(files=[], logs=[], file_error=False)
+    await state.update_data(files=[], logs=[], file_error=False, exact=exact)
 
 @router.message(CountStates.waiting_files, F.document, F.chat.type == "private")
 async def count_receive_file(message: types.Message, state: FSMContext, bot: Bot):
@@ -112,25 +68,19 @@ async def count_receive_file(message: types.Message, state: FSMContext, bot: Bot
     if data.get("file_error"):
         return
     if ext not in allowed_ext:
-        await state.update_data(files=[], logs=[], file_error=True)
+        await mark_file_error(state)
         bot_msg = "❌ Format file tidak didukung!\nUlangi dengan /count"
         await message.answer(bot_msg)
         log_bot(bot_msg)
         return
     try:
-        files = data.get("files", [])
-        logs = data.get("logs", [])
-        filename, ext_real = os.path.splitext(file.file_name)
-        import time
-        timestamp = int(time.time() * 1000)
-        unique_name = f"{filename}_{timestamp}{ext_real}"
-        file_path = os.path.join(DATA_DIR, unique_name)
-        await bot.download(file, destination=file_path)
-        files.append((file_path, file.file_name, message.message_id))
-        logs.append((message.message_id, f"bot: File {file.file_name} diterima"))
-        await state.update_data(files=files, logs=logs)
-        state_now = await state.get_data()
-        if len(state_now.get("files", [])) == 1 and not state_now.get("file_error"):
+        # Jumlah nomor valid diambil dari cache parsing (hanya angka yang dikirim balik dari job),
+        # dibaca seperti /nodup: txt/csv per baris, xlsx sheet pertama, vcf nomor TEL.
+        # Mode cepat tidak parsing, tapi file yang sudah ada di cache tetap tidak perlu didownload.
+        total = await receive_upload(
+            message, state, bot, parser=line_parser(ext), derive=len, preparse=bool(data.get("exact")),
+        )
+        if total == 1:
             bot_msg = "✅ File diterima. Ketik /done jika sudah."
             await message.answer(bot_msg)
             log_bot(bot_msg)
@@ -156,17 +106,31 @@ async def count_done(message: types.Message, state: FSMContext):
     await state.update_data(files=files, logs=logs)
     for _, log_msg in logs:
         logging.info(log_msg)
+    await run_queued(message, process_count, message, state, files, data.get("exact", False))
+
+async def process_count(message: types.Message, state: FSMContext, files, exact=False):
     total_all = 0
     msg_lines = []
     try:
         for file_path, original_filename, _ in files:
             _, ext = os.path.splitext(original_filename.lower())
-            numbers = await extract_numbers_from_file(file_path, ext)
-            jumlah = len(numbers)
+            if exact or is_cached(file_path):
+                jumlah = await take_parsed(file_path, line_parser(ext), len)
+                # Mode cepat: file dari cache langsung dapat jumlah nomor valid
+                label = "" if exact else " (nomor valid)"
+            else:
+                discard_parsed([file_path])
+                jumlah = await run_job(fast_count_file, file_path, ext)
+                label = ""
             total_all += jumlah
-            msg_lines.append(f"{original_filename}: {jumlah} kontak")
+            msg_lines.append(f"{original_filename}: {jumlah} kontak{label}")
         msg_lines.append(f"Total semua file: {total_all} kontak")
-        bot_msg = "📊 Hasil hitung kontak:\n" + "\n".join(msg_lines)
+        if exact:
+            bot_msg = "📊 Hasil hitung kontak (nomor valid):\n" + "\n".join(msg_lines)
+        else:
+            # Hitung cepat: jumlah TEL / baris, nomor tidak divalidasi
+            bot_msg = "📊 Hasil hitung kontak (cepat, tanpa validasi nomor):\n" + "\n".join(msg_lines)
+            bot_msg += "\nKetik /count exact untuk hitung nomor valid saja."
         await message.answer(bot_msg)
         log_bot(bot_msg)
     except Exception as e:
@@ -1,19 +1,22 @@
 import logging
 import os
-import time
-import aiofiles
 import asyncio
 from aiogram import Router, types, F, Bot
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.filters import Command
-from utils.file import extract_numbers
-from utils.number_cleaner import extract_valid_numbers_from_lines, clean_and_validate_number
+from utils.file import pack_numbers_sync, iter_numbers_sync, extract_unique_numbers
+from utils.number_cleaner import extract_valid_numbers_from_lines, clean_and_validate_number, PackedNumbers
+from utils.format import write_chunked
+from utils.number_index import NumberIndex
+from utils.blocklist import exclude_blocked, filter_blocked
+from utils.spreadsheet import write_rows
 from utils.retry_send import retry_send_document
-from managemen.membership import check_membership, send_membership_message, delete_join_message
-from managemen.status import save_user
+from utils.executor import run_job
+from utils.output import SpooledOutput
+from utils.scheduler import run_queued
+from utils.upload import receive_upload, mark_file_error, download_document
 from managemen.data_file import log_file_upload
-from managemen.message import save_user_for_broadcast
 
 router = Router()
 
@@ -39,13 +42,6 @@ async def delete_global(message: types.Message, state: FSMContext):
     await delete_start(message, state)
 
 async def delete_start(message: types.Message, state: FSMContext):
-    save_user_for_broadcast(message.from_user)
-    save_user(message.from_user.username)
-    in_group, in_channel = await check_membership(message.bot, message.from_user.id)
-    if not (in_group and in_channel):
-        await send_membership_message(message, in_group, in_channel)
-        return
-    await delete_join_message(message.bot, message.from_user.id, message.chat.id)
     log_user(message)
     bot_msg = "🗑️ Kirim file yang ingin dihapus nomornya"
     await message.answer(bot_msg)
@@ -67,25 +63,15 @@ async def delete_receive_file(message: types.Message, state: FSMContext, bot: Bo
         return
 
     if ext not in allowed_ext:
-        await state.update_data(files=[], logs=[], file_error=True)
+        await mark_file_error(state)
         bot_msg = "❌ Format file tidak didukung!\nKetik /delete untuk mulai ulang."
         await message.answer(bot_msg)
         log_bot(bot_msg)
         return
 
     try:
-        files = data.get("files", [])
-        logs = data.get("logs", [])
-        filename, ext_real = os.path.splitext(file.file_name)
-        timestamp = int(time.time() * 1000)
-        unique_name = f"{filename}_{timestamp}{ext_real}"
-        file_path = os.path.join(DATA_DIR, unique_name)
-        await bot.download(file, destination=file_path)
-        files.append((file_path, file.file_name, message.message_id))
-        logs.append((message.message_id, f"bot: File {file.file_name} diterima"))
-        await state.update_data(files=files, logs=logs)
-        state_now = await state.get_data()
-        if len(state_now.get("files", [])) == 1 and not state_now.get("file_error"):
+        total = await receive_upload(message, state, bot)
+        if total == 1:
             bot_msg = "✅ File diterima. Ketik /done untuk lanjut."
             await message.answer(bot_msg)
             log_bot(bot_msg)
@@ -111,11 +97,33 @@ async def delete_done(message: types.Message, state: FSMContext):
     await state.update_data(files=files, logs=logs)
     for _, log_msg in logs:
         logging.info(log_msg)
-    bot_msg = "🚫 Masukkan nomor yang ingin dihapus (satu per baris):"
+    bot_msg = "🚫 Masukkan nomor yang ingin dihapus (satu per baris), atau kirim file daftar nomor (.txt/.csv/.xlsx/.vcf):"
     await message.answer(bot_msg)
     log_bot(bot_msg)
     await state.set_state(DeleteStates.waiting_numbers)
 
+@router.message(DeleteStates.waiting_numbers, F.document, F.chat.type == "private")
+async def delete_receive_number_file(message: types.Message, state: FSMContext, bot: Bot):
+    """Daftar nomor yang dihapus dikirim sebagai file (bisa ratusan ribu nomor)."""
+    log_user(message)
+    await log_file_upload(message)
+    _, ext = os.path.splitext(message.document.file_name.lower())
+    if ext not in [".txt", ".xlsx", ".xls", ".vcf", ".csv"]:
+        bot_msg = "❌ Format file tidak didukung! Kirim file .txt/.csv/.xlsx/.vcf atau ketik nomornya."
+        await message.answer(bot_msg)
+        log_bot(bot_msg)
+        return
+    try:
+        file_path = await download_document(message, bot)
+    except Exception as e:
+        err_msg = "⚠️ Gagal menerima file. Coba lagi."
+        log_bot(err_msg)
+        logging.error(f"user: kirim file {message.document.file_name} error: {e}")
+        await message.answer(err_msg)
+        return
+    await state.update_data(numbers_to_delete=[], delete_list=file_path)
+    await run_queued(message, process_delete, message, state)
+
 @router.message(DeleteStates.waiting_numbers, F.chat.type == "private")
 async def delete_receive_numbers(message: types.Message, state: FSMContext):
     if message.text.strip().startswith("/"):
@@ -133,51 +141,63 @@ async def delete_receive_numbers(message: types.Message, state: FSMContext):
         log_bot(bot_msg)
         return
     await state.update_data(numbers_to_delete=numbers_to_delete)
-    await process_delete(message, state)
+    await run_queued(message, process_delete, message, state)
+
+def _tel_number(line):
+    """Nomor valid dari baris TEL vcf, None untuk baris lain."""
+    if line.strip().startswith("TEL"):
+        return clean_and_validate_number(line.split(":")[-1].strip())
+    return None
+
+def delete_numbers_file(file_path, ext, output_path, index, user_id=None):
+    """
+    Hapus nomor dari satu file dan tulis hasilnya (dijalankan di job executor). Return isi output atau path.
+    index: NumberIndex nomor yang dihapus; dicek per chunk dengan searchsorted,
+    file input dibaca sekali secara streaming. Nomor di blocklist user ikut dihapus.
+    """
+    out = SpooledOutput(output_path)
+    if ext == ".vcf":
+        # Hapus hanya baris TEL yang nomornya cocok, struktur lain tetap
+        with open(file_path, "r", encoding="utf-8") as src, out.text() as dst:
+            lines = index.exclude(src, number_of=_tel_number)
+            dst.writelines(exclude_blocked(lines, user_id, number_of=_tel_number))
+        return out.result()
+    if ext in [".xlsx", ".xls"]:
+        old_numbers = pack_numbers_sync(file_path)
+        new_numbers = filter_blocked(old_numbers.select(~index.contains_numbers(old_numbers)), user_id)
+        write_rows(out, ((nomor,) for nomor in new_numbers), header=["Nomor"])
+    else:
+        write_chunked(out, exclude_blocked(index.exclude(iter_numbers_sync(file_path)), user_id))
+    return out.result()
 
 async def process_delete(message: types.Message, state: FSMContext):
     data = await state.get_data()
     files = data.get("files", [])
-    numbers_to_delete = set(data.get("numbers_to_delete", []))
-    file_paths_to_delete = []
+    delete_list = data.get("delete_list")
+    file_paths_to_delete = [delete_list] if delete_list else []
     try:
+        if delete_list:
+            # Daftar nomor dari file: diparsing di job executor, hasilnya sudah ringkas (uint64)
+            numbers_to_delete = await run_job(extract_unique_numbers, delete_list)
+            if not numbers_to_delete:
+                bot_msg = "⚠️ Tidak ada nomor valid di file daftar. Ketik /delete untuk ulang."
+                await message.answer(bot_msg)
+                log_bot(bot_msg)
+                return
+            log_bot(f"{len(numbers_to_delete)} nomor dari file daftar akan dihapus")
+        else:
+            # Di-pack sekali, dikirim ringkas ke job tiap file
+            numbers_to_delete = PackedNumbers.from_iter(data.get("numbers_to_delete", []))
+        # Index terurut dibangun sekali untuk semua file
+        index = NumberIndex.from_numbers(numbers_to_delete)
         for file_path, original_filename, _ in files:
             logging.info(f"user: proses file {os.path.basename(file_path)}")
             _, ext = os.path.splitext(original_filename.lower())
-            if ext == ".vcf":
-                # Hapus hanya baris TEL yang nomornya cocok, struktur lain tetap
-                async with aiofiles.open(file_path, "r", encoding="utf-8") as f:
-                    lines = await f.readlines()
-                new_lines = []
-                for line in lines:
-                    if line.strip().startswith("TEL"):
-                        nomor = line.split(":")[-1].strip()
-                        nomor_bersih = clean_and_validate_number(nomor)
-                        if nomor_bersih and nomor_bersih in numbers_to_delete:
-                            continue  # skip baris ini
-                    new_lines.append(line)
-                output_path = os.path.join(DATA_DIR, original_filename)
-                async with aiofiles.open(output_path, "w", encoding="utf-8") as f:
-                    await f.writelines(new_lines)
-            elif ext in [".txt", ".csv"]:
-                old_numbers = await extract_numbers(file_path)
-                new_numbers = [n for n in old_numbers if n not in numbers_to_delete]
-                async with aiofiles.open(os.path.join(DATA_DIR, original_filename), "w", encoding="utf-8") as f:
-                    await f.write("\n".join(new_numbers))
-            elif ext in [".xlsx", ".xls"]:
-                import pandas as pd
-                old_numbers = await extract_numbers(file_path)
-                new_numbers = [n for n in old_numbers if n not in numbers_to_delete]
-                df = pd.DataFrame({"Nomor": new_numbers})
-                df.to_excel(os.path.join(DATA_DIR, original_filename), index=False)
-            else:
-                old_numbers = await extract_numbers(file_path)
-                new_numbers = [n for n in old_numbers if n not in numbers_to_delete]
-                async with aiofiles.open(os.path.join(DATA_DIR, original_filename), "w", encoding="utf-8") as f:
-                    await f.write("\n".join(new_numbers))
-            await retry_send_document(message, os.path.join(DATA_DIR, original_filename), original_filename)
+            output_path = os.path.join(DATA_DIR, original_filename)
+            file_paths_to_delete.append(output_path)
+            output = await run_job(delete_numbers_file, file_path, ext, output_path, index, message.from_user.id)
+            await retry_send_document(message, output, original_filename)
             log_bot(f"kirim file {original_filename}")
-            file_paths_to_delete.append(os.path.join(DATA_DIR, original_filename))
         bot_msg = "📤 File berhasil dikirim!"
         await message.answer(bot_msg)
         log_bot(bot_msg)
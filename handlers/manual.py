@@ -1,16 +1,14 @@
 import logging
 import os
-import aiofiles
-import asyncio
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.filters import Command
+from utils.number_cleaner import extract_valid_numbers_from_lines
 from utils.retry_send import retry_send_document
+from utils.format import write_vcf
+from utils.executor import run_job
 import time
-from managemen.membership import check_membership, send_membership_message, delete_join_message
-from managemen.status import save_user
-from managemen.message import save_user_for_broadcast
 
 router = Router()
 
@@ -27,57 +25,6 @@ def log_user(message: types.Message):
 def log_bot(text: str):
     logging.info(f"bot: {text}")
 
-def clean_and_validate_number(line):
-    """
-    Bersihkan dan validasi nomor:
-    - Hapus semua karakter kecuali angka dan +
-    - Jika ada + di awal, pertahankan, sisanya hanya angka
-    - Jika tidak ada + di awal, tambahkan + di depan
-    - Nomor valid: minimal 8 digit angka (tanpa +)
-    - Return nomor valid dengan + di depan, atau None jika tidak valid
-    """
-    import re
-    line = line.strip()
-    if not line:
-        return None
-    if line.startswith("+"):
-        nomor = "+" + re.sub(r"[^\d]", "", line[1:])
-    else:
-        nomor = re.sub(r"[^\d]", "", line)
-        nomor = "+" + nomor
-    digit_count = len(re.sub(r"[^\d]", "", nomor))
-    if digit_count < 8:
-        return None
-    return nomor
-
-def extract_valid_numbers_from_lines(lines):
-    numbers = []
-    for line in lines:
-        nomor = clean_and_validate_number(line)
-        if nomor:
-            numbers.append(nomor)
-    return numbers
-
-async def write_vcf_file(output_path, vcf_content, max_retry=3, delay=2):
-    for attempt in range(1, max_retry + 1):
-        try:
-            async with aiofiles.open(output_path, "w", encoding="utf-8") as f:
-                await f.write(vcf_content)
-            return True
-        except Exception as e:
-            logging.error(f"Error writing vcf: {e} (percobaan {attempt})")
-            if attempt == max_retry:
-                raise
-            await asyncio.sleep(delay)
-
-def create_vcf_content(contact_names, numbers):
-    vcf_entries = []
-    for name, number in zip(contact_names, numbers):
-        vcf_entries.append(
-            f"BEGIN:VCARD\nVERSION:3.0\nFN:{name}\nTEL;TYPE=CELL:{number}\nEND:VCARD"
-        )
-    return "\n".join(vcf_entries)
-
 # Handler global: selalu clear state sebelum lanjut ke handler utama
 @router.message(Command("manual"), F.chat.type == "private")
 async def manual_global(message: types.Message, state: FSMContext):
@@ -111,13 +58,6 @@ async def help_from_manual(message: types.Message, state: FSMContext):
 #Handler utama
 @router.message(Command("manual"), F.chat.type == "private")
 async def manual_start(message: types.Message, state: FSMContext):
-    save_user_for_broadcast(message.from_user)
-    save_user(message.from_user.username)
-    in_group, in_channel = await check_membership(message.bot, message.from_user.id)
-    if not (in_group and in_channel):
-        await send_membership_message(message, in_group, in_channel)
-        return
-    await delete_join_message(message.bot, message.from_user.id, message.chat.id)
     log_user(message)
     bot_msg = "Masukkan nomor:"
     await message.answer(bot_msg)
@@ -191,10 +131,9 @@ async def manual_receive_filename(message: types.Message, state: FSMContext):
     # Nama file hasil sesuai input user, tanpa kode unik/timestamp
     output_name = f"{filename}.vcf"
     output_path = os.path.join(DATA_DIR, output_name)
-    vcf_content = create_vcf_content(contact_names, numbers)
     try:
-        await write_vcf_file(output_path, vcf_content)
-        await retry_send_document(message, output_path, output_name)
+        output = await run_job(write_vcf, output_path, contact_names, numbers)
+        await retry_send_document(message, output, output_name)
         log_bot(f"kirim file {output_name}")
         bot_msg = "File berhasil dikirim."
         await message.answer(bot_msg)
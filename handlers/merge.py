@@ -1,16 +1,21 @@
 import logging
 import os
-import aiofiles
 import asyncio
 from aiogram import Router, types, F, Bot
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.filters import Command
 from utils.retry_send import retry_send_document
-from managemen.membership import check_membership, send_membership_message, delete_join_message
-from managemen.status import save_user
+from utils.executor import run_job
+from utils.output import SpooledOutput
+from utils.format import write_chunked
+from utils.number_cleaner import clean_and_validate_number
+from utils.number_index import DedupCounter
+from utils.scheduler import run_queued
+from utils.upload import receive_upload, mark_file_error
+from utils.vcard import iter_vcards, write_vcards
+from utils.spreadsheet import iter_rows, write_rows
 from managemen.data_file import log_file_upload
-from managemen.message import save_user_for_broadcast
 
 router = Router()
 DATA_DIR = "data"
@@ -29,25 +34,124 @@ def log_user(message: types.Message):
 def log_bot(text: str):
     logging.info(f"bot: {text}")
 
+def _header_keys(header):
+    """Kunci kolom (nama, urutan kemunculan) supaya kolom bernama sama tidak saling timpa."""
+    seen = {}
+    keys = []
+    for name in header:
+        name = "" if name is None else str(name)
+        seen[name] = seen.get(name, 0) + 1
+        keys.append((name, seen[name]))
+    return keys
+
+def card_number(item):
+    return item[1]
+
+def row_number(row):
+    """Nomor valid pertama di satu baris spreadsheet (dipakai dedup merge)."""
+    for value in row:
+        nomor = clean_and_validate_number(str(value)) if value is not None else None
+        if nomor:
+            return nomor
+    return None
+
+def iter_vcf_cards(file_paths):
+    """Yield (kartu, nomor valid pertama) dari semua file vcf berurutan, streaming."""
+    for file_path in file_paths:
+        for card in iter_vcards(file_path):
+            nomor = None
+            for tel in card.tels:
+                nomor = clean_and_validate_number(tel)
+                if nomor:
+                    break
+            yield card.raw, nomor
+
+def iter_lines(file_paths):
+    """Yield semua baris (tanpa newline) dari semua file teks berurutan, streaming."""
+    for file_path in file_paths:
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                yield line.rstrip("\n")
+
+def merge_xlsx_files(file_paths, output_path, dedup=None):
+    """
+    Gabung baris semua spreadsheet (sheet pertama) seperti pd.concat: kolom disejajarkan per nama header.
+    Header dibaca dulu, lalu baris di-stream ke workbook write-only.
+    dedup: DedupCounter untuk buang baris yang nomornya sudah muncul (opsional).
+    """
+    headers = []
+    for file_path in file_paths:
+        headers.append(_header_keys(next(iter_rows(file_path), ())))
+    columns = []
+    for keys in headers:
+        for key in keys:
+            if key not in columns:
+                columns.append(key)
+    positions = {key: idx for idx, key in enumerate(columns)}
+
+    def merged_rows():
+        for file_path, keys in zip(file_paths, headers):
+            slots = [positions[key] for key in keys]
+            rows = iter_rows(file_path)
+            next(rows, None)
+            for row in rows:
+                out = [None] * len(columns)
+                for slot, value in zip(slots, row):
+                    out[slot] = value
+                yield out
+
+    rows = merged_rows()
+    if dedup is not None:
+        rows = dedup.filter(rows, number_of=row_number, keep_missing=True)
+    return write_rows(output_path, rows, header=[name for name, _ in columns])
+
+def merge_files(ext, file_paths, output_path, dedup=False):
+    """
+    Gabung semua file ke output_path (dijalankan di job executor), semua input dibaca streaming.
+    dedup: kontak/baris yang nomornya sudah muncul di file manapun sebelumnya dibuang
+    (kontak/baris tanpa nomor valid tetap ikut).
+    Return (isi output (bytes) atau output_path, jumlah duplikat dibuang), atau None jika format tidak didukung.
+    """
+    counter = DedupCounter() if dedup else None
+    out = SpooledOutput(output_path)
+    if ext == ".vcf":
+        # Gabung semua blok BEGIN:VCARD ... END:VCARD, kartu ditulis streaming per file
+        cards = iter_vcf_cards(file_paths)
+        if counter is not None:
+            cards = counter.filter(cards, number_of=card_number, keep_missing=True)
+        with out.text() as f:
+            write_vcards(f, (card for card, _ in cards))
+    elif ext in [".txt", ".csv"]:
+        # Gabung semua baris, ditulis per potongan
+        lines = iter_lines(file_paths)
+        if counter is not None:
+            lines = counter.filter(lines, number_of=clean_and_validate_number, keep_missing=True)
+        write_chunked(out, lines)
+    elif ext in [".xlsx", ".xls"]:
+        merge_xlsx_files(file_paths, out, counter)
+    else:
+        return None
+    dupes = counter.file_dupes + counter.cross_dupes if counter is not None else 0
+    return out.result(), dupes
+
 @router.message(Command("merge"), F.chat.type == "private")
 async def merge_global(message: types.Message, state: FSMContext):
     await state.clear()
     await merge_start(message, state)
 
 async def merge_start(message: types.Message, state: FSMContext):
-    save_user_for_broadcast(message.from_user)
-    save_user(message.from_user.username)
-    in_group, in_channel = await check_membership(message.bot, message.from_user.id)
-    if not (in_group and in_channel):
-        await send_membership_message(message, in_group, in_channel)
-        return
-    await delete_join_message(message.bot, message.from_user.id, message.chat.id)
     log_user(message)
-    bot_msg = "📎 Kirim file yang mau digabung.\nminimal 2 file, format sama."
+    # /merge nodup: nomor duplikat (di file manapun) ikut dibuang saat digabung
+    args = (message.text or "").split()[1:]
+    dedup = bool(args) and args[0].lower() == "nodup"
+    if dedup:
+        bot_msg = "📎 Kirim file yang mau digabung.\nminimal 2 file, format sama.\n🔎 Nomor duplikat ikut dihapus."
+    else:
+        bot_msg = "📎 Kirim file yang mau digabung.\nminimal 2 file, format sama.\nKetik /merge nodup untuk sekalian hapus nomor duplikat."
     await message.answer(bot_msg)
     log_bot(bot_msg)
     await state.set_state(MergeStates.waiting_files)
-    await state.update_data(files=[], logs=[], file_error=False, ext=None)
+    await state.update_data(files=[], logs=[], file_error=False, ext=None, dedup=dedup)
 
 @router.message(MergeStates.waiting_files, F.document, F.chat.type == "private")
 async def merge_receive_file(message: types.Message, state: FSMContext, bot: Bot):
@@ -64,26 +168,15 @@ async def merge_receive_file(message: types.Message, state: FSMContext, bot: Bot
         await state.update_data(ext=ext)
     # Jika format file berikutnya beda, error
     elif ext != data.get("ext"):
-        await state.update_data(files=[], logs=[], file_error=True, ext=None)
+        await mark_file_error(state, ext=None)
         bot_msg = "❌ Semua file harus format sama!\nUlangi dengan /merge"
         await message.answer(bot_msg)
         log_bot(bot_msg)
         return
 
     try:
-        files = data.get("files", [])
-        logs = data.get("logs", [])
-        filename, ext_real = os.path.splitext(file.file_name)
-        import time
-        timestamp = int(time.time() * 1000)
-        unique_name = f"{filename}_{timestamp}{ext_real}"
-        file_path = os.path.join(DATA_DIR, unique_name)
-        await bot.download(file, destination=file_path)
-        files.append((file_path, file.file_name, message.message_id))
-        logs.append((message.message_id, f"bot: File {file.file_name} diterima"))
-        await state.update_data(files=files, logs=logs)
-        state_now = await state.get_data()
-        if len(state_now.get("files", [])) == 2 and not state_now.get("file_error"):
+        total = await receive_upload(message, state, bot)
+        if total == 2:
             bot_msg = "✅ File diterima. Ketik /done jika sudah."
             await message.answer(bot_msg)
             log_bot(bot_msg)
@@ -129,6 +222,9 @@ async def merge_receive_filename(message: types.Message, state: FSMContext):
         log_bot(bot_msg)
         return
 
+    await run_queued(message, process_merge, message, state, filename)
+
+async def process_merge(message: types.Message, state: FSMContext, filename):
     data = await state.get_data()
     files = data.get("files", [])
     ext = data.get("ext")
@@ -137,51 +233,21 @@ async def merge_receive_filename(message: types.Message, state: FSMContext):
     file_paths_to_delete = []
 
     try:
-        # Gabung file sesuai format
-        if ext == ".vcf":
-            # Gabung semua blok BEGIN:VCARD ... END:VCARD
-            all_vcards = []
-            for file_path, _, _ in files:
-                async with aiofiles.open(file_path, "r", encoding="utf-8") as f:
-                    content = await f.read()
-                cards = content.split("BEGIN:VCARD")
-                for card in cards:
-                    card = card.strip()
-                    if not card:
-                        continue
-                    if not card.startswith("BEGIN:VCARD"):
-                        card = "BEGIN:VCARD\n" + card
-                    all_vcards.append(card)
-            merged_content = "\n".join(all_vcards)
-            async with aiofiles.open(output_path, "w", encoding="utf-8") as f:
-                await f.write(merged_content)
-        elif ext in [".txt", ".csv"]:
-            # Gabung semua baris
-            all_lines = []
-            for file_path, _, _ in files:
-                async with aiofiles.open(file_path, "r", encoding="utf-8") as f:
-                    lines = await f.readlines()
-                all_lines.extend([line.rstrip("\n") for line in lines])
-            async with aiofiles.open(output_path, "w", encoding="utf-8") as f:
-                await f.write("\n".join(all_lines))
-        elif ext in [".xlsx", ".xls"]:
-            import pandas as pd
-            all_dfs = []
-            for file_path, _, _ in files:
-                df = pd.read_excel(file_path)
-                all_dfs.append(df)
-            merged_df = pd.concat(all_dfs, ignore_index=True)
-            merged_df.to_excel(output_path, index=False)
-        else:
+        # Gabung file sesuai format (di job executor)
+        result = await run_job(merge_files, ext, [f[0] for f in files], output_path, data.get("dedup", False))
+        if result is None:
             bot_msg = f"Format {ext} belum didukung untuk merge."
             await message.answer(bot_msg)
             log_bot(bot_msg)
             await state.clear()
             return
 
-        await retry_send_document(message, output_path, output_name)
+        output, dupes = result
+        await retry_send_document(message, output, output_name)
         log_bot(f"kirim file {output_name}")
         bot_msg = "✅ File gabungan sudah dikirim!"
+        if data.get("dedup"):
+            bot_msg += f"\n🔎 {dupes} nomor duplikat dihapus."
         await message.answer(bot_msg)
         log_bot(bot_msg)
         file_paths_to_delete.append(output_path)
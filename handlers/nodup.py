@@ -1,16 +1,25 @@
 import logging
 import os
-import aiofiles
 import asyncio
 from aiogram import Router, types, F, Bot
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.filters import Command
+from utils.number_cleaner import clean_and_validate_number
+from utils.file import iter_numbers_sync, line_parser
 from utils.retry_send import retry_send_document
-from managemen.membership import check_membership, send_membership_message, delete_join_message
-from managemen.status import save_user
+from utils.executor import run_job
+from utils.output import SpooledOutput
+from utils.format import write_chunked
+from utils.number_index import DedupCounter
+from utils.blocklist import BlockedFilter, filter_blocked
+from utils.scheduler import run_queued
+from utils.upload import receive_upload, mark_file_error, take_parsed
+from utils.parse_cache import all_numbers
+from utils.spreadsheet import write_rows
+from utils.vcard import iter_vcards, write_vcards
 from managemen.data_file import log_file_upload
-from managemen.message import save_user_for_broadcast
+from config import SEND_MEMORY_LIMIT
 
 router = Router()
 DATA_DIR = "data"
@@ -28,89 +37,104 @@ def log_user(message: types.Message):
 def log_bot(text: str):
     logging.info(f"bot: {text}")
 
-def clean_and_validate_number(line):
-    import re
-    line = line.strip()
-    if not line:
-        return None
-    if line.startswith("+"):
-        nomor = "+" + re.sub(r"[^\d]", "", line[1:])
-    else:
-        nomor = re.sub(r"[^\d]", "", line)
-        nomor = "+" + nomor
-    digit_count = len(re.sub(r"[^\d]", "", nomor))
-    if digit_count < 8:
-        return None
-    return nomor
-
-async def extract_numbers_from_vcf(file_path):
-    numbers = []
-    vcards = []
-    async with aiofiles.open(file_path, "r", encoding="utf-8") as f:
-        content = await f.read()
-    cards = content.split("BEGIN:VCARD")
-    for card in cards:
-        card = card.strip()
-        if not card:
-            continue
-        if not card.startswith("BEGIN:VCARD"):
-            card = "BEGIN:VCARD\n" + card
-        tel_lines = [line for line in card.splitlines() if line.strip().startswith("TEL")]
+def extract_numbers_from_vcf(file_path):
+    """Yield (kartu, nomor valid pertama) per kontak secara streaming."""
+    for card in iter_vcards(file_path):
         nomor = None
-        for line in tel_lines:
-            nomor_raw = line.split(":")[-1].strip()
-            nomor = clean_and_validate_number(nomor_raw)
+        for tel in card.tels:
+            nomor = clean_and_validate_number(tel)
             if nomor:
                 break
-        vcards.append((card, nomor))
-        numbers.append(nomor)
-    return vcards
+        yield card.raw, nomor
 
-async def extract_numbers_from_file(file_path, ext):
-    numbers = []
-    if ext == ".vcf":
-        vcards = await extract_numbers_from_vcf(file_path)
-        numbers = [n for _, n in vcards if n]
-    elif ext in [".txt", ".csv"]:
-        async with aiofiles.open(file_path, "r", encoding="utf-8") as f:
-            lines = await f.readlines()
-        for line in lines:
-            nomor = clean_and_validate_number(line)
-            if nomor:
-                numbers.append(nomor)
-    elif ext in [".xlsx", ".xls"]:
+def card_number(item):
+    return item[1]
+
+def nodup_vcf_file(file_path, output_path, user_id=None):
+    """
+    Tulis ulang vcf tanpa kontak duplikat, kartu dibaca dan ditulis streaming.
+    Return (jumlah duplikat, jumlah kontak di blocklist, output).
+    """
+    seen = set()
+    dupes = 0
+    blocked = BlockedFilter(user_id)
+    def unique_cards():
+        nonlocal dupes
+        # Kontak yang nomornya ada di blocklist user ikut dibuang
+        for card, nomor in blocked.exclude(extract_numbers_from_vcf(file_path), number_of=card_number):
+            if nomor and nomor not in seen:
+                seen.add(nomor)
+                yield card
+            elif nomor:
+                dupes += 1
+    out = SpooledOutput(output_path)
+    with out.text() as f:
+        write_vcards(f, unique_cards())
+    return dupes, blocked.blocked, out.result()
+
+def nodup_numbers(all_numbers, ext, output_path, user_id=None):
+    """
+    Hapus nomor duplikat (dan nomor di blocklist user) dari semua nomor file non-vcf (hasil cache
+    parsing) lalu tulis hasilnya (dijalankan di job executor).
+    Return (jumlah duplikat, jumlah nomor di blocklist, isi output dalam bytes atau output_path).
+    """
+    numbers = filter_blocked(all_numbers, user_id)
+    blocked = len(all_numbers) - len(numbers)
+    new_numbers = numbers.unique()
+    dupes = len(numbers) - len(new_numbers)
+    out = SpooledOutput(output_path)
+    if ext in [".xlsx", ".xls"]:
         import pandas as pd
-        df = pd.read_excel(file_path)
-        for col in df.columns:
-            for val in df[col]:
-                nomor = clean_and_validate_number(str(val))
-                if nomor:
-                    numbers.append(nomor)
+        df = pd.DataFrame({"Nomor": new_numbers.tolist()})
+        df.to_excel(out, index=False)
     else:
-        async with aiofiles.open(file_path, "r", encoding="utf-8") as f:
-            lines = await f.readlines()
-        for line in lines:
-            nomor = clean_and_validate_number(line)
-            if nomor:
-                numbers.append(nomor)
-    return numbers
+        write_chunked(out, new_numbers)
+    return dupes, blocked, out.result()
+
+def nodup_files_global(files, output_paths, user_id=None):
+    """
+    Hapus duplikat lintas semua file (dijalankan di job executor): nomor yang sudah muncul
+    di file sebelumnya ikut dihapus. Index nomor dibagi ke semua file (uint64 terurut).
+    Return list (duplikat per file, duplikat lintas file, nomor di blocklist, output) sesuai urutan files.
+    """
+    counter = DedupCounter()
+    blocked = BlockedFilter(user_id)
+    # Batas memori output dibagi rata supaya total hasil tetap <= SEND_MEMORY_LIMIT
+    max_size = SEND_MEMORY_LIMIT // max(len(files), 1)
+    results = []
+    for (file_path, original_filename, _), output_path in zip(files, output_paths):
+        _, ext = os.path.splitext(original_filename.lower())
+        counter.start_file()
+        blocked_before = blocked.blocked
+        out = SpooledOutput(output_path, max_size)
+        if ext == ".vcf":
+            cards = blocked.exclude(extract_numbers_from_vcf(file_path), number_of=card_number)
+            cards = counter.filter(cards, number_of=card_number)
+            with out.text() as f:
+                write_vcards(f, (card for card, _ in cards))
+        elif ext in [".xlsx", ".xls"]:
+            numbers = counter.filter(blocked.exclude(iter_numbers_sync(file_path, line_parser(ext))))
+            write_rows(out, ((nomor,) for nomor in numbers), header=["Nomor"])
+        else:
+            write_chunked(out, counter.filter(blocked.exclude(iter_numbers_sync(file_path, line_parser(ext)))))
+        results.append((counter.file_dupes, counter.cross_dupes, blocked.blocked - blocked_before, out.result()))
+    return results
 
 @router.message(Command("nodup"), F.chat.type == "private")
 async def nodup_global(message: types.Message, state: FSMContext):
     await state.clear()
-    save_user_for_broadcast(message.from_user)
-    save_user(message.from_user.username)
-    in_group, in_channel = await check_membership(message.bot, message.from_user.id)
-    if not (in_group and in_channel):
-        await send_membership_message(message, in_group, in_channel)
-        return
-    await delete_join_message(message.bot, message.from_user.id, message.chat.id)
     log_user(message)
-    bot_msg = "📎 Kirim file yang mau dihapus nomor duplikatnya."
+    # /nodup global: duplikat antar file juga dihapus
+    args = (message.text or "").split()[1:]
+    global_mode = bool(args) and args[0].lower() == "global"
+    if global_mode:
+        bot_msg = "📎 Kirim file yang mau dihapus nomor duplikatnya.\n🌐 Mode global: nomor yang sudah ada di file sebelumnya ikut dihapus."
+    else:
+        bot_msg = "📎 Kirim file yang mau dihapus nomor duplikatnya.\nKetik /nodup global untuk hapus duplikat antar file."
     await message.answer(bot_msg)
     log_bot(bot_msg)
     await state.set_state(NodupStates.waiting_files)
-    await state.update_data(files=[], logs=[], file_error=False)
+    await state.update_data(files=[], logs=[], file_error=False, global_mode=global_mode)
 
 @router.message(NodupStates.waiting_files, F.document, F.chat.type == "private")
 async def nodup_receive_file(message: types.Message, state: FSMContext, bot: Bot):
@@ -123,25 +147,17 @@ async def nodup_receive_file(message: types.Message, state: FSMContext, bot: Bot
     if data.get("file_error"):
         return
     if ext not in allowed_ext:
-        await state.update_data(files=[], logs=[], file_error=True)
+        await mark_file_error(state)
         bot_msg = "❌ Format file tidak didukung!\nUlangi dengan /nodup"
         await message.answer(bot_msg)
         log_bot(bot_msg)
         return
     try:
-        files = data.get("files", [])
-        logs = data.get("logs", [])
-        filename, ext_real = os.path.splitext(file.file_name)
-        import time
-        timestamp = int(time.time() * 1000)
-        unique_name = f"{filename}_{timestamp}{ext_real}"
-        file_path = os.path.join(DATA_DIR, unique_name)
-        await bot.download(file, destination=file_path)
-        files.append((file_path, file.file_name, message.message_id))
-        logs.append((message.message_id, f"bot: File {file.file_name} diterima"))
-        await state.update_data(files=files, logs=logs)
-        state_now = await state.get_data()
-        if len(state_now.get("files", [])) == 1 and not state_now.get("file_error"):
+        # Mode biasa non-vcf cukup butuh nomor file, bisa diambil dari cache parsing.
+        # vcf dan mode global membaca ulang record file aslinya.
+        derive = None if ext == ".vcf" or data.get("global_mode") else all_numbers
+        total = await receive_upload(message, state, bot, parser=line_parser(ext), derive=derive)
+        if total == 1:
             bot_msg = "✅ File diterima. Ketik /done jika sudah."
             await message.answer(bot_msg)
             log_bot(bot_msg)
@@ -167,88 +183,86 @@ async def nodup_done(message: types.Message, state: FSMContext):
     await state.update_data(files=files, logs=logs)
     for _, log_msg in logs:
         logging.info(log_msg)
+    if data.get("global_mode"):
+        await run_queued(message, process_nodup_global, message, state, files)
+    else:
+        await run_queued(message, process_nodup, message, state, files)
+
+async def remove_output_files(paths):
+    async def remove_file(path):
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+                logging.info(f"File hasil dihapus: {path}")
+        except Exception as e:
+            logging.error(f"Gagal hapus file hasil: {path} ({e})")
+    await asyncio.gather(*(remove_file(path) for path in paths))
+
+async def process_nodup_global(message: types.Message, state: FSMContext, files):
+    # Semua output disiapkan sekaligus, nama file di disk dibuat unik per urutan
+    output_paths = [os.path.join(DATA_DIR, f"{idx}_{original_filename}") for idx, (_, original_filename, _) in enumerate(files)]
+    try:
+        results = await run_job(nodup_files_global, files, output_paths, message.from_user.id)
+        report = []
+        total_file = 0
+        total_cross = 0
+        total_blocked = 0
+        for (_, original_filename, _), (file_dupes, cross_dupes, blocked, output) in zip(files, results):
+            await retry_send_document(message, output, original_filename)
+            log_bot(f"kirim file {original_filename}")
+            line = f"• {original_filename}: {file_dupes} duplikat di file, {cross_dupes} dari file sebelumnya"
+            if blocked:
+                line += f", {blocked} di blocklist"
+            report.append(line)
+            total_file += file_dupes
+            total_cross += cross_dupes
+            total_blocked += blocked
+        if total_file + total_cross > 0:
+            bot_msg = (
+                f"🔎 {total_file + total_cross} nomor duplikat dihapus "
+                f"({total_file} di file yang sama, {total_cross} antar file).\n" + "\n".join(report)
+            )
+        else:
+            bot_msg = "✅ Nomor duplikat tidak ditemukan di file manapun."
+        if total_blocked:
+            bot_msg += f"\n🚫 {total_blocked} nomor di blocklist dihapus."
+            if not total_file + total_cross:
+                bot_msg += "\n" + "\n".join(report)
+        await message.answer(bot_msg)
+        log_bot(bot_msg)
+    except Exception as e:
+        err_msg = f"❌ Gagal hapus duplikat. Ulangi dengan /nodup global\n{e}"
+        logging.error(err_msg)
+        log_bot(err_msg)
+        await message.answer(err_msg)
+    finally:
+        await remove_output_files(output_paths)
+        await state.clear()
+
+async def process_nodup(message: types.Message, state: FSMContext, files):
     total_dupes = 0
+    total_blocked = 0
     file_paths_to_delete = []
     try:
         for file_path, original_filename, _ in files:
             _, ext = os.path.splitext(original_filename.lower())
+            output_path = os.path.join(DATA_DIR, original_filename)
             if ext == ".vcf":
-                vcards = await extract_numbers_from_vcf(file_path)
-                seen = set()
-                new_vcards = []
-                dupes = 0
-                for card, nomor in vcards:
-                    if nomor and nomor not in seen:
-                        seen.add(nomor)
-                        new_vcards.append(card)
-                    elif nomor:
-                        dupes += 1
-                total_dupes += dupes
-                output_path = os.path.join(DATA_DIR, original_filename)
-                async with aiofiles.open(output_path, "w", encoding="utf-8") as f:
-                    await f.write("\n".join(new_vcards))
-                await retry_send_document(message, output_path, original_filename)
-                log_bot(f"kirim file {original_filename}")
-                file_paths_to_delete.append(output_path)
-            elif ext in [".txt", ".csv"]:
-                numbers = await extract_numbers_from_file(file_path, ext)
-                seen = set()
-                new_numbers = []
-                dupes = 0
-                for nomor in numbers:
-                    if nomor not in seen:
-                        seen.add(nomor)
-                        new_numbers.append(nomor)
-                    else:
-                        dupes += 1
-                total_dupes += dupes
-                output_path = os.path.join(DATA_DIR, original_filename)
-                async with aiofiles.open(output_path, "w", encoding="utf-8") as f:
-                    await f.write("\n".join(new_numbers))
-                await retry_send_document(message, output_path, original_filename)
-                log_bot(f"kirim file {original_filename}")
-                file_paths_to_delete.append(output_path)
-            elif ext in [".xlsx", ".xls"]:
-                import pandas as pd
-                numbers = await extract_numbers_from_file(file_path, ext)
-                seen = set()
-                new_numbers = []
-                dupes = 0
-                for nomor in numbers:
-                    if nomor not in seen:
-                        seen.add(nomor)
-                        new_numbers.append(nomor)
-                    else:
-                        dupes += 1
-                total_dupes += dupes
-                output_path = os.path.join(DATA_DIR, original_filename)
-                df = pd.DataFrame({"Nomor": new_numbers})
-                df.to_excel(output_path, index=False)
-                await retry_send_document(message, output_path, original_filename)
-                log_bot(f"kirim file {original_filename}")
-                file_paths_to_delete.append(output_path)
+                dupes, blocked, output = await run_job(nodup_vcf_file, file_path, output_path, message.from_user.id)
             else:
-                numbers = await extract_numbers_from_file(file_path, ext)
-                seen = set()
-                new_numbers = []
-                dupes = 0
-                for nomor in numbers:
-                    if nomor not in seen:
-                        seen.add(nomor)
-                        new_numbers.append(nomor)
-                    else:
-                        dupes += 1
-                total_dupes += dupes
-                output_path = os.path.join(DATA_DIR, original_filename)
-                async with aiofiles.open(output_path, "w", encoding="utf-8") as f:
-                    await f.write("\n".join(new_numbers))
-                await retry_send_document(message, output_path, original_filename)
-                log_bot(f"kirim file {original_filename}")
-                file_paths_to_delete.append(output_path)
+                numbers = await take_parsed(file_path, line_parser(ext), all_numbers)
+                dupes, blocked, output = await run_job(nodup_numbers, numbers, ext, output_path, message.from_user.id)
+            total_dupes += dupes
+            total_blocked += blocked
+            await retry_send_document(message, output, original_filename)
+            log_bot(f"kirim file {original_filename}")
+            file_paths_to_delete.append(output_path)
         if total_dupes > 0:
             bot_msg = f"🔎 {total_dupes} nomor duplikat dihapus di semua file."
         else:
             bot_msg = "✅ Nomor duplikat tidak ditemukan di file manapun."
+        if total_blocked:
+            bot_msg += f"\n🚫 {total_blocked} nomor di blocklist dihapus."
         await message.answer(bot_msg)
         log_bot(bot_msg)
     except Exception as e:
@@ -257,12 +271,5 @@ async def nodup_done(message: types.Message, state: FSMContext):
         log_bot(err_msg)
         await message.answer(err_msg)
     finally:
-        async def remove_file(path):
-            try:
-                if os.path.exists(path):
-                    os.remove(path)
-                    logging.info(f"File hasil dihapus: {path}")
-            except Exception as e:
-                logging.error(f"Gagal hapus file hasil: {path} ({e})")
-        await asyncio.gather(*(remove_file(path) for path in file_paths_to_delete))
+        await remove_output_files(file_paths_to_delete)
         await state.clear()
\ No newline at end of file
@@ -1,16 +1,16 @@
 import logging
 import os
-import aiofiles
 import asyncio
 from aiogram import Router, types, F, Bot
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.filters import Command
-from utils.retry_send import retry_send_document
-from managemen.membership import check_membership, send_membership_message, delete_join_message
-from managemen.status import save_user
+from utils.retry_send import retry_send_document, retry_resend_document
+from utils.executor import run_job
+from utils.output import SpooledOutput
+from utils.scheduler import run_queued
+from utils.upload import receive_upload, mark_file_error
 from managemen.data_file import log_file_upload
-from managemen.message import save_user_for_broadcast
 
 router = Router()
 DATA_DIR = "data"
@@ -30,19 +30,31 @@ def log_user(message: types.Message):
 def log_bot(text: str):
     logging.info(f"bot: {text}")
 
+def file_contains(file_path, text):
+    """Cek apakah teks ada di file (dijalankan di job executor)."""
+    with open(file_path, "r", encoding="utf-8") as f:
+        return text in f.read()
+
+def replace_in_file(file_path, output_path, old_name, new_name):
+    """
+    Ganti nama kontak dan tulis ke output_path.
+    Return isi output (bytes) atau output_path, atau None (tanpa menulis) jika nama tidak ada.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        content = f.read()
+    if old_name not in content:
+        return None
+    out = SpooledOutput(output_path)
+    with out.text() as f:
+        f.write(content.replace(old_name, new_name))
+    return out.result()
+
 @router.message(Command("renamectc"), F.chat.type == "private")
 async def renamectc_global(message: types.Message, state: FSMContext):
     await state.clear()
     await renamectc_start(message, state)
 
 async def renamectc_start(message: types.Message, state: FSMContext):
-    save_user_for_broadcast(message.from_user)
-    save_user(message.from_user.username)
-    in_group, in_channel = await check_membership(message.bot, message.from_user.id)
-    if not (in_group and in_channel):
-        await send_membership_message(message, in_group, in_channel)
-        return
-    await delete_join_message(message.bot, message.from_user.id, message.chat.id)
     log_user(message)
     bot_msg = "Kirim file .vcf yang mau diganti nama kontaknya"
     await message.answer(bot_msg)
@@ -63,26 +75,15 @@ async def renamectc_receive_file(message: types.Message, state: FSMContext, bot:
         return
 
     if ext not in allowed_ext:
-        await state.update_data(files=[], logs=[], file_error=True)
+        await mark_file_error(state)
         bot_msg = "❌ Hanya file .vcf yang didukung!\nKetik /renamectc untuk mulai ulang."
         await message.answer(bot_msg)
         log_bot(bot_msg)
         return
 
     try:
-        files = data.get("files", [])
-        logs = data.get("logs", [])
-        filename, ext_real = os.path.splitext(file.file_name)
-        import time
-        timestamp = int(time.time() * 1000)
-        unique_name = f"{filename}_{timestamp}{ext_real}"
-        file_path = os.path.join(DATA_DIR, unique_name)
-        await bot.download(file, destination=file_path)
-        files.append((file_path, file.file_name, message.message_id))
-        logs.append((message.message_id, f"bot: File {file.file_name} diterima"))
-        await state.update_data(files=files, logs=logs)
-        state_now = await state.get_data()
-        if len(state_now.get("files", [])) == 1 and not state_now.get("file_error"):
+        total = await receive_upload(message, state, bot)
+        if total == 1:
             bot_msg = "✅ File diterima. Ketik /done untuk lanjut."
             await message.answer(bot_msg)
             log_bot(bot_msg)
@@ -133,9 +134,7 @@ async def renamectc_receive_old_name(message: types.Message, state: FSMContext):
     files = data.get("files", [])
     found = False
     for file_path, original_filename, _ in files:
-        async with aiofiles.open(file_path, "r", encoding="utf-8") as f:
-            content = await f.read()
-        if old_name in content:
+        if await run_job(file_contains, file_path, old_name):
             found = True
             break
     if not found:
@@ -163,23 +162,27 @@ async def renamectc_receive_new_name(message: types.Message, state: FSMContext):
         await message.answer(bot_msg)
         log_bot(bot_msg)
         return
+    await run_queued(message, process_renamectc, message, state, new_name)
+
+async def process_renamectc(message: types.Message, state: FSMContext, new_name):
     data = await state.get_data()
     files = data.get("files", [])
     old_name = data.get("old_name", "")
+    file_ids = data.get("file_ids", {})
     file_paths_to_delete = []
     try:
         for file_path, original_filename, _ in files:
-            async with aiofiles.open(file_path, "r", encoding="utf-8") as f:
-                content = await f.read()
-            if old_name in content:
-                new_content = content.replace(old_name, new_name)
-                output_name = original_filename
-                output_path = os.path.join(DATA_DIR, output_name)
-                async with aiofiles.open(output_path, "w", encoding="utf-8") as f:
-                    await f.write(new_content)
-                await retry_send_document(message, output_path, output_name)
+            output_name = original_filename
+            output_path = os.path.join(DATA_DIR, output_name)
+            output = await run_job(replace_in_file, file_path, output_path, old_name, new_name)
+            if output is not None:
+                await retry_send_document(message, output, output_name)
                 log_bot(f"kirim file {output_name}")
                 file_paths_to_delete.append(output_path)
+            elif file_ids.get(file_path):
+                # Kirim balik file tanpa perubahan lewat file_id, tanpa upload ulang
+                await retry_resend_document(message, file_ids[file_path])
+                log_bot(f"kirim file {original_filename} (tidak ada perubahan)")
             else:
                 # Kirim balik file tanpa perubahan
                 await retry_send_document(message, file_path, original_filename)
@@ -1,20 +1,15 @@
 import logging
 import os
-import aiofiles
-import asyncio
 from aiogram import Router, types, F, Bot
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.filters import Command
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from utils.retry_send import retry_send_document
-from managemen.membership import check_membership, send_membership_message, delete_join_message
-from managemen.status import save_user
+from utils.retry_send import retry_send_document, retry_resend_document
+from utils.upload import receive_upload
 from managemen.data_file import log_file_upload
-from managemen.message import save_user_for_broadcast
 
 router = Router()
-DATA_DIR = "data"
 
 class RenameFileStates(StatesGroup):
     waiting_mode = State()
@@ -37,13 +32,6 @@ def log_bot(text: str):
 @router.message(Command("renamefile"), F.chat.type == "private")
 async def renamefile_global(message: types.Message, state: FSMContext):
     await state.clear()
-    save_user_for_broadcast(message.from_user)
-    save_user(message.from_user.username)
-    in_group, in_channel = await check_membership(message.bot, message.from_user.id)
-    if not (in_group and in_channel):
-        await send_membership_message(message, in_group, in_channel)
-        return
-    await delete_join_message(message.bot, message.from_user.id, message.chat.id)
     log_user(message)
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
@@ -96,19 +84,8 @@ async def handle_file_receive(message, state, mode_state):
     if data.get("file_error"):
         return
     try:
-        files = data.get("files", [])
-        logs = data.get("logs", [])
-        filename, ext_real = os.path.splitext(file.file_name)
-        import time
-        timestamp = int(time.time() * 1000)
-        unique_name = f"{filename}_{timestamp}{ext_real}"
-        file_path = os.path.join(DATA_DIR, unique_name)
-        await message.bot.download(file, destination=file_path)
-        files.append((file_path, file.file_name, message.message_id))
-        logs.append((message.message_id, f"bot: File {file.file_name} diterima"))
-        await state.update_data(files=files, logs=logs)
-        state_now = await state.get_data()
-        if len(state_now.get("files", [])) == 1 and not state_now.get("file_error"):
+        total = await receive_upload(message, state)
+        if total == 1:
             bot_msg = "✅ File diterima. Ketik /done untuk lanjut."
             await message.answer(bot_msg)
             log_bot(bot_msg)
@@ -171,6 +148,30 @@ async def renamefile_done_manual(message: types.Message, state: FSMContext):
     log_bot(bot_msg)
     await state.set_state(RenameFileStates.waiting_manual_names)
 
+async def send_renamed(message: types.Message, state: FSMContext, files, new_names):
+    """
+    Kirim balik file upload dengan nama baru. Nama hanya diganti di filename saat upload,
+    isi file tidak disalin. File yang namanya tidak berubah dikirim ulang lewat file_id.
+    """
+    file_ids = (await state.get_data()).get("file_ids", {})
+    try:
+        for (file_path, original_filename, _), new_name in zip(files, new_names):
+            if new_name == original_filename and file_ids.get(file_path):
+                await retry_resend_document(message, file_ids[file_path])
+            else:
+                await retry_send_document(message, file_path, new_name)
+            log_bot(f"kirim file {new_name}")
+        bot_msg = "📤 File sudah dikirim!"
+        await message.answer(bot_msg)
+        log_bot(bot_msg)
+    except Exception as e:
+        err_msg = f"❌ Gagal rename file. Ketik /renamefile untuk ulang.\n{e}"
+        logging.error(err_msg)
+        log_bot(err_msg)
+        await message.answer(err_msg)
+    finally:
+        await state.clear()
+
 # --- Rename otomatis ---
 @router.message(RenameFileStates.waiting_base_name, F.chat.type == "private")
 async def renamefile_base_name(message: types.Message, state: FSMContext):
@@ -205,34 +206,7 @@ async def renamefile_base_name(message: types.Message, state: FSMContext):
             dupe_idx += 1
         used_names.add(name)
         result_names.append(name)
-    # Kirim file hasil rename
-    file_paths_to_delete = []
-    try:
-        for (file_path, _, _), new_name in zip(files, result_names):
-            output_path = os.path.join(DATA_DIR, new_name)
-            async with aiofiles.open(file_path, "rb") as src, aiofiles.open(output_path, "wb") as dst:
-                await dst.write(await src.read())
-            await retry_send_document(message, output_path, new_name)
-            log_bot(f"kirim file {new_name}")
-            file_paths_to_delete.append(output_path)
-        bot_msg = "📤 File sudah dikirim!"
-        await message.answer(bot_msg)
-        log_bot(bot_msg)
-    except Exception as e:
-        err_msg = f"❌ Gagal rename file. Ketik /renamefile untuk ulang.\n{e}"
-        logging.error(err_msg)
-        log_bot(err_msg)
-        await message.answer(err_msg)
-    finally:
-        async def remove_file(path):
-            try:
-                if os.path.exists(path):
-                    os.remove(path)
-                    logging.info(f"File hasil dihapus: {path}")
-            except Exception as e:
-                logging.error(f"Gagal hapus file hasil: {path} ({e})")
-        await asyncio.gather(*(remove_file(path) for path in file_paths_to_delete))
-        await state.clear()
+    await send_renamed(message, state, files, result_names)
 
 # --- Rename manual ---
 @router.message(RenameFileStates.waiting_manual_names, F.chat.type == "private")
@@ -267,31 +241,5 @@ async def renamefile_manual_names(message: types.Message, state: FSMContext):
         await message.answer(bot_msg)
         log_bot(bot_msg)
     else:
-        # Semua nama sudah didapat, proses rename dan kirim file
-        file_paths_to_delete = []
-        try:
-            for (file_path, _, _), new_name in zip(files, manual_names):
-                output_path = os.path.join(DATA_DIR, new_name)
-                async with aiofiles.open(file_path, "rb") as src, aiofiles.open(output_path, "wb") as dst:
-                    await dst.write(await src.read())
-                await retry_send_document(message, output_path, new_name)
-                log_bot(f"kirim file {new_name}")
-                file_paths_to_delete.append(output_path)
-            bot_msg = "📤 File sudah dikirim!"
-            await message.answer(bot_msg)
-            log_bot(bot_msg)
-        except Exception as e:
-            err_msg = f"❌ Gagal rename file. Ketik /renamefile untuk ulang.\n{e}"
-            logging.error(err_msg)
-            log_bot(err_msg)
-            await message.answer(err_msg)
-        finally:
-            async def remove_file(path):
-                try:
-                    if os.path.exists(path):
-                        os.remove(path)
-                        logging.info(f"File hasil dihapus: {path}")
-                except Exception as e:
-                    logging.error(f"Gagal hapus file hasil: {path} ({e})")
-            await asyncio.gather(*(remove_file(path) for path in file_paths_to_delete))
-            await state.clear()
\ No newline at end of file
+        # Semua nama sudah didapat, kirim file dengan nama baru
+        await send_renamed(message, state, files, manual_names)
@@ -1,17 +1,23 @@
 import logging
 import os
-import aiofiles
 import asyncio
+import pickle
+import struct
+from array import array
 from aiogram import Router, types, F, Bot
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.filters import Command
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from utils.retry_send import retry_send_document
-from managemen.membership import check_membership, send_membership_message, delete_join_message
-from managemen.status import save_user
+from utils.executor import run_job, run_pipeline
+from utils.output import SpooledOutput
+from utils.format import write_chunked
+from utils.records import count_records, record_ranges, iter_range_records
+from utils.scheduler import run_queued
+from utils.upload import receive_upload, mark_file_error
+from utils.spreadsheet import iter_rows, write_rows
 from managemen.data_file import log_file_upload
-from managemen.message import save_user_for_broadcast
 
 router = Router()
 DATA_DIR = "data"
@@ -34,13 +40,6 @@ def log_bot(text: str):
 @router.message(Command("split"), F.chat.type == "private")
 async def split_global(message: types.Message, state: FSMContext):
     await state.clear()
-    save_user_for_broadcast(message.from_user)
-    save_user(message.from_user.username)
-    in_group, in_channel = await check_membership(message.bot, message.from_user.id)
-    if not (in_group and in_channel):
-        await send_membership_message(message, in_group, in_channel)
-        return
-    await delete_join_message(message.bot, message.from_user.id, message.chat.id)
     log_user(message)
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
@@ -91,25 +90,14 @@ async def split_receive_file(message: types.Message, state: FSMContext, bot: Bot
     if data.get("file_error"):
         return
     if ext not in allowed_ext:
-        await state.update_data(files=[], logs=[], file_error=True)
+        await mark_file_error(state)
         bot_msg = "❌ Format file tidak didukung!\nUlangi dengan /split"
         await message.answer(bot_msg)
         log_bot(bot_msg)
         return
     try:
-        files = data.get("files", [])
-        logs = data.get("logs", [])
-        filename, ext_real = os.path.splitext(file.file_name)
-        import time
-        timestamp = int(time.time() * 1000)
-        unique_name = f"{filename}_{timestamp}{ext_real}"
-        file_path = os.path.join(DATA_DIR, unique_name)
-        await bot.download(file, destination=file_path)
-        files.append((file_path, file.file_name, message.message_id))
-        logs.append((message.message_id, f"bot: File {file.file_name} diterima"))
-        await state.update_data(files=files, logs=logs)
-        state_now = await state.get_data()
-        if len(state_now.get("files", [])) == 1 and not state_now.get("file_error"):
+        total = await receive_upload(message, state, bot)
+        if total == 1:
             bot_msg = "✅ File diterima. Ketik /done jika sudah."
             await message.answer(bot_msg)
             log_bot(bot_msg)
@@ -165,132 +153,130 @@ async def split_receive_count(message: types.Message, state: FSMContext):
         log_bot(bot_msg)
         return
 
-    await process_split(message, state, files, split_mode, count)
+    await run_queued(message, process_split, message, state, files, split_mode, count)
+
+def _part_sizes(total, split_mode, count):
+    """Jumlah record per part: mode file = dibagi rata ke count file, mode kontak = count per file."""
+    if split_mode == "file":
+        per_file = total // count
+        sisa = total % count
+        return [per_file + (1 if i < sisa else 0) for i in range(count)]
+    part_total = (total + count - 1) // count
+    return [min(count, total - i*count) for i in range(part_total)]
+
+def split_plan(file_path, original_filename, split_mode, count):
+    """
+    Hitung pembagian part file vcf/txt/csv (dijalankan di job executor): pass pertama hanya
+    menghitung batas record, pass kedua mencari offset byte di batas tiap part.
+    Return (list rentang byte (start, end) per part, pesan peringatan atau None).
+    """
+    ext = os.path.splitext(original_filename)[1].lower()
+    total = count_records(file_path, ext)
+    if split_mode == "file" and count > total:
+        label = "Kontak" if ext == ".vcf" else "Baris"
+        return [], f"⚠️ {label} cuma {total}. Tidak bisa dipecah jadi {count} file."
+    return record_ranges(file_path, ext, _part_sizes(total, split_mode, count)), None
+
+def write_part(file_path, ext, start, end, output_path):
+    """Tulis satu part (rentang byte file input) ke output (dijalankan di job executor). Return bytes atau output_path."""
+    out = SpooledOutput(output_path)
+    write_chunked(out, iter_range_records(file_path, ext, start, end))
+    return out.result()
+
+# Baris xlsx/xls di file spool: panjang (uint32) + pickle tuple nilai sel
+_ROW_LEN = struct.Struct("<I")
+
+def split_sheet_plan(file_path, split_mode, count, rows_path):
+    """
+    Baca xlsx/xls sekali (dijalankan di job executor) dan tulis baris datanya ke file spool
+    rows_path, supaya tiap part bisa ditulis job sendiri dari rentang byte spool (seperti txt/vcf).
+    Return (header, list rentang byte (start, end) per part, pesan peringatan atau None).
+    """
+    rows = iter_rows(file_path)
+    header = next(rows, None)
+    offsets = array("q", [0])  # offset awal tiap baris + akhir file spool
+    with open(rows_path, "wb") as f:
+        for row in rows:
+            data = pickle.dumps(tuple(row), protocol=pickle.HIGHEST_PROTOCOL)
+            f.write(_ROW_LEN.pack(len(data)))
+            f.write(data)
+            offsets.append(offsets[-1] + _ROW_LEN.size + len(data))
+    total = len(offsets) - 1
+    if split_mode == "file" and count > total:
+        return header, [], f"⚠️ Data cuma {total}. Tidak bisa dipecah jadi {count} file."
+    ranges = []
+    start = 0
+    for n in _part_sizes(total, split_mode, count):
+        ranges.append((offsets[start], offsets[start + n]))
+        start += n
+    return header, ranges, None
+
+def _iter_spooled_rows(rows_path, start, end):
+    with open(rows_path, "rb") as f:
+        f.seek(start)
+        while f.tell() < end:
+            size, = _ROW_LEN.unpack(f.read(_ROW_LEN.size))
+            yield pickle.loads(f.read(size))
+
+def write_sheet_part(rows_path, start, end, header, output_path):
+    """Tulis satu part xlsx dari rentang byte file spool (dijalankan di job executor). Return bytes atau output_path."""
+    out = SpooledOutput(output_path)
+    write_rows(out, _iter_spooled_rows(rows_path, start, end), header=header)
+    return out.result()
 
 async def process_split(message: types.Message, state: FSMContext, files, split_mode, count):
     file_paths_to_delete = []
-    try:
-        for file_path, original_filename, _ in files:
-            _, ext = os.path.splitext(original_filename)
-            base_name = os.path.splitext(original_filename)[0]
-            # --- Ambil data kontak ---
-            if ext == ".vcf":
-                async with aiofiles.open(file_path, "r", encoding="utf-8") as f:
-                    content = await f.read()
-                cards = content.split("BEGIN:VCARD")
-                vcards = []
-                for card in cards:
-                    card = card.strip()
-                    if not card:
-                        continue
-                    if not card.startswith("BEGIN:VCARD"):
-                        card = "BEGIN:VCARD\n" + card
-                    vcards.append(card)
-                total = len(vcards)
-                if split_mode == "file":
-                    if count > total:
-                        bot_msg = f"⚠️ Kontak cuma {total}. Tidak bisa dipecah jadi {count} file."
-                        await message.answer(bot_msg)
-                        log_bot(bot_msg)
-                        continue
-                    per_file = total // count
-                    sisa = total % count
-                    idx = 0
-                    for i in range(count):
-                        n = per_file + (1 if i < sisa else 0)
-                        part = vcards[idx:idx+n]
-                        idx += n
-                        output_name = f"{base_name}_{i+1}{ext}"
-                        output_path = os.path.join(DATA_DIR, output_name)
-                        async with aiofiles.open(output_path, "w", encoding="utf-8") as f:
-                            await f.write("\n".join(part))
-                        await retry_send_document(message, output_path, output_name)
-                        log_bot(f"kirim file {output_name}")
-                        file_paths_to_delete.append(output_path)
-                else:
-                    part_total = (total + count - 1) // count
-                    for i in range(part_total):
-                        part = vcards[i*count:(i+1)*count]
-                        output_name = f"{base_name}_{i+1}{ext}"
-                        output_path = os.path.join(DATA_DIR, output_name)
-                        async with aiofiles.open(output_path, "w", encoding="utf-8") as f:
-                            await f.write("\n".join(part))
-                        await retry_send_document(message, output_path, output_name)
-                        log_bot(f"kirim file {output_name}")
-                        file_paths_to_delete.append(output_path)
-            elif ext in [".txt", ".csv"]:
-                async with aiofiles.open(file_path, "r", encoding="utf-8") as f:
-                    lines = [line.rstrip("\n") for line in await f.readlines()]
-                total = len(lines)
-                if split_mode == "file":
-                    if count > total:
-                        bot_msg = f"⚠️ Baris cuma {total}. Tidak bisa dipecah jadi {count} file."
-                        await message.answer(bot_msg)
-                        log_bot(bot_msg)
-                        continue
-                    per_file = total // count
-                    sisa = total % count
-                    idx = 0
-                    for i in range(count):
-                        n = per_file + (1 if i < sisa else 0)
-                        part = lines[idx:idx+n]
-                        idx += n
-                        output_name = f"{base_name}_{i+1}{ext}"
-                        output_path = os.path.join(DATA_DIR, output_name)
-                        async with aiofiles.open(output_path, "w", encoding="utf-8") as f:
-                            await f.write("\n".join(part))
-                        await retry_send_document(message, output_path, output_name)
-                        log_bot(f"kirim file {output_name}")
-                        file_paths_to_delete.append(output_path)
-                else:
-                    part_total = (total + count - 1) // count
-                    for i in range(part_total):
-                        part = lines[i*count:(i+1)*count]
-                        output_name = f"{base_name}_{i+1}{ext}"
-                        output_path = os.path.join(DATA_DIR, output_name)
-                        async with aiofiles.open(output_path, "w", encoding="utf-8") as f:
-                            await f.write("\n".join(part))
-                        await retry_send_document(message, output_path, output_name)
-                        log_bot(f"kirim file {output_name}")
-                        file_paths_to_delete.append(output_path)
-            elif ext in [".xlsx", ".xls"]:
-                import pandas as pd
-                df = pd.read_excel(file_path)
-                total = len(df)
-                if split_mode == "file":
-                    if count > total:
-                        bot_msg = f"⚠️ Data cuma {total}. Tidak bisa dipecah jadi {count} file."
-                        await message.answer(bot_msg)
-                        log_bot(bot_msg)
-                        continue
-                    per_file = total // count
-                    sisa = total % count
-                    idx = 0
-                    for i in range(count):
-                        n = per_file + (1 if i < sisa else 0)
-                        part = df.iloc[idx:idx+n]
-                        idx += n
-                        output_name = f"{base_name}_{i+1}{ext}"
-                        output_path = os.path.join(DATA_DIR, output_name)
-                        part.to_excel(output_path, index=False)
-                        await retry_send_document(message, output_path, output_name)
-                        log_bot(f"kirim file {output_name}")
-                        file_paths_to_delete.append(output_path)
-                else:
-                    part_total = (total + count - 1) // count
-                    for i in range(part_total):
-                        part = df.iloc[i*count:(i+1)*count]
-                        output_name = f"{base_name}_{i+1}{ext}"
-                        output_path = os.path.join(DATA_DIR, output_name)
-                        part.to_excel(output_path, index=False)
-                        await retry_send_document(message, output_path, output_name)
-                        log_bot(f"kirim file {output_name}")
-                        file_paths_to_delete.append(output_path)
-            else:
-                bot_msg = f"Format {ext} belum didukung untuk split."
-                await message.answer(bot_msg)
-                log_bot(bot_msg)
+
+    async def write_job(func, *args, output_name):
+        return "file", await run_job(func, *args), output_name
+
+    async def parts():
+        """Yield part (job tulis) dan pesan peringatan sesuai urutan kirim ke chat."""
+        for file_path, original_filename, upload_message_id in files:
+            base_name, ext = os.path.splitext(original_filename)
+            # Nama file di disk diberi prefix user + pesan upload supaya tidak bentrok dengan
+            # upload bernama sama, baik dari user ini maupun user lain
+            output_prefix = f"{message.from_user.id}_{upload_message_id}_"
+            if ext.lower() in [".xlsx", ".xls"]:
+                rows_path = os.path.join(DATA_DIR, f"{output_prefix}{base_name}.rows")
+                file_paths_to_delete.append(rows_path)
+                header, ranges, warning = await run_job(split_sheet_plan, file_path, split_mode, count, rows_path)
+                if warning:
+                    yield "pesan", warning
+                    continue
+                # Tiap part ditulis job sendiri, dikirim selagi part berikutnya ditulis
+                for idx, (start, end) in enumerate(ranges):
+                    output_name = f"{base_name}_{idx+1}{ext}"
+                    output_path = os.path.join(DATA_DIR, f"{output_prefix}{output_name}")
+                    file_paths_to_delete.append(output_path)
+                    yield write_job(write_sheet_part, rows_path, start, end, header, output_path, output_name=output_name)
+                continue
+            if ext.lower() not in [".vcf", ".txt", ".csv"]:
+                yield "pesan", f"Format {ext} belum didukung untuk split."
                 continue
+            ranges, warning = await run_job(split_plan, file_path, original_filename, split_mode, count)
+            if warning:
+                yield "pesan", warning
+                continue
+            # Tiap part ditulis job sendiri langsung dari rentang byte file input
+            for idx, (start, end) in enumerate(ranges):
+                output_name = f"{base_name}_{idx+1}{ext}"
+                output_path = os.path.join(DATA_DIR, f"{output_prefix}{output_name}")
+                file_paths_to_delete.append(output_path)
+                yield write_job(write_part, file_path, ext.lower(), start, end, output_path, output_name=output_name)
+
+    async def send(item):
+        if item[0] == "pesan":
+            await message.answer(item[1])
+            log_bot(item[1])
+            return
+        _, output, output_name = item
+        await retry_send_document(message, output, output_name)
+        log_bot(f"kirim file {output_name}")
+
+    try:
+        # Part berikutnya ditulis di job executor selagi part sebelumnya diupload
+        await run_pipeline(parts(), send)
         bot_msg = "📤 File hasil split sudah dikirim!"
         await message.answer(bot_msg)
         log_bot(bot_msg)
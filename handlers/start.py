@@ -2,9 +2,6 @@ from aiogram import Router, types, F
 from aiogram.filters import Command
 import logging
 from aiogram.fsm.context import FSMContext
-from managemen.status import save_user
-from managemen.membership import check_membership, send_membership_message, delete_join_message
-from managemen.message import save_user_for_broadcast
 
 router = Router()
 
@@ -27,6 +24,7 @@ fitur = [
     "/split       - pecah file",
     "/count       - hitung jumlah kontak",
     "/nodup       - hapus kontak duplikat",
+    "/blocklist   - nomor yang selalu dibuang",
 ]
 
 keyboard = types.ReplyKeyboardMarkup(
@@ -67,22 +65,12 @@ async def start_global(message: types.Message, state: FSMContext):
 @router.message(Command("to_vcf"), F.chat.type == "private")
 async def to_vcf_from_start(message: types.Message, state: FSMContext):
     await state.clear()
-    in_group, in_channel = await check_membership(message.bot, message.from_user.id)
-    if not (in_group and in_channel):
-        await send_membership_message(message, in_group, in_channel)
-        return
-    await delete_join_message(message.bot, message.from_user.id, message.chat.id)
     from handlers.to_vcf import to_vcf_start
     await to_vcf_start(message, state)
 
 @router.message(Command("to_txt"), F.chat.type == "private")
 async def to_txt_from_start(message: types.Message, state: FSMContext):
     await state.clear()
-    in_group, in_channel = await check_membership(message.bot, message.from_user.id)
-    if not (in_group and in_channel):
-        await send_membership_message(message, in_group, in_channel)
-        return
-    await delete_join_message(message.bot, message.from_user.id, message.chat.id)
     from handlers.to_txt import to_txt_start
     await to_txt_start(message, state)
 
@@ -93,13 +81,6 @@ async def help_global(message: types.Message, state: FSMContext):
 
 @router.message(Command("start"), F.chat.type == "private")
 async def start_handler(message: types.Message, state: FSMContext):
-    in_group, in_channel = await check_membership(message.bot, message.from_user.id)
-    if not (in_group and in_channel):
-        await send_membership_message(message, in_group, in_channel)
-        return
-    await delete_join_message(message.bot, message.from_user.id, message.chat.id)
-    save_user(message.from_user.username)
-    save_user_for_broadcast(message.from_user)  # <-- PENTING: simpan user id
     nama = message.from_user.full_name or message.from_user.username or "pengguna"
     bot_msg = (
         f"Hallo *{nama}*, selamat datang di bot\n"
@@ -114,11 +95,6 @@ async def start_handler(message: types.Message, state: FSMContext):
 
 @router.message(Command("help"), F.chat.type == "private")
 async def help_handler(message: types.Message, state: FSMContext):
-    in_group, in_channel = await check_membership(message.bot, message.from_user.id)
-    if not (in_group and in_channel):
-        await send_membership_message(message, in_group, in_channel)
-        return
-    await delete_join_message(message.bot, message.from_user.id, message.chat.id)
     log_user(message)
     bot_msg = (
         "*Fitur bot:*\n"
@@ -1,18 +1,18 @@
 import logging
 import os
-import time
-import aiofiles
 import asyncio
 from aiogram import Router, types, F, Bot
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.filters import Command
-from utils.file import extract_numbers
+from utils.file import unique_sheet_numbers, convert_csv_to_txt, file_parser
+from utils.executor import run_job
+from utils.output import SpooledOutput
+from utils.format import write_chunked
+from utils.scheduler import run_queued
+from utils.upload import receive_upload, mark_file_error, take_parsed, is_cached
 from utils.retry_send import retry_send_document
-from managemen.membership import check_membership, send_membership_message, delete_join_message
-from managemen.status import save_user
 from managemen.data_file import log_file_upload
-from managemen.message import save_user_for_broadcast
 
 router = Router()
 
@@ -30,18 +30,18 @@ def log_user(message: types.Message):
 def log_bot(text: str):
     logging.info(f"bot: {text}")
 
-# Fungsi tulis file txt dengan retry
-async def write_txt_file(output_path, content, max_retry=3, delay=2):
-    for attempt in range(1, max_retry + 1):
-        try:
-            async with aiofiles.open(output_path, "w", encoding="utf-8") as f:
-                await f.write(content)
-            return True
-        except Exception as e:
-            logging.error(f"Error writing txt: {e} (percobaan {attempt})")
-            if attempt == max_retry:
-                raise
-            await asyncio.sleep(delay)
+def txt_numbers(numbers, ext):
+    """Nomor untuk hasil txt dari nomor cache parsing (dijalankan di job executor): xlsx tanpa duplikat."""
+    return unique_sheet_numbers(numbers, ext)
+
+def write_txt_numbers(numbers, output_path):
+    """
+    Tulis nomor (PackedNumbers) ke txt satu per baris (dijalankan di job executor).
+    Return isi output dalam bytes (hasil kecil) atau output_path.
+    """
+    out = SpooledOutput(output_path)
+    write_chunked(out, numbers)
+    return out.result()
 
 # Handler global: selalu clear state sebelum lanjut ke handler utama
 @router.message(Command("to_txt"), F.chat.type == "private")
@@ -71,13 +71,6 @@ async def help_from_txt(message: types.Message, state: FSMContext):
 # Handler utama
 @router.message(Command("to_txt"), F.chat.type == "private")
 async def to_txt_start(message: types.Message, state: FSMContext):
-    save_user_for_broadcast(message.from_user)
-    save_user(message.from_user.username)
-    in_group, in_channel = await check_membership(message.bot, message.from_user.id)
-    if not (in_group and in_channel):
-        await send_membership_message(message, in_group, in_channel)
-        return
-    await delete_join_message(message.bot, message.from_user.id, message.chat.id)
     log_user(message)
     bot_msg = "📄 Kirim file untuk diubah ke .txt"
     await message.answer(bot_msg)
@@ -101,7 +94,7 @@ async def to_txt_receive_file(message: types.Message, state: FSMContext, bot: Bo
 
     # Jika ada file salah format, reset semua file & logs, set flag error, kirim error, dan JANGAN proses apapun lagi
     if ext == ".txt":
-        await state.update_data(files=[], logs=[], file_error=True)
+        await mark_file_error(state)
         bot_msg = "❌ Format .txt tidak didukung!\nKetik /to_txt untuk mulai ulang."
         await message.answer(bot_msg)
         log_bot(bot_msg)
@@ -109,20 +102,10 @@ async def to_txt_receive_file(message: types.Message, state: FSMContext, bot: Bo
 
     # File valid, proses seperti biasa (hanya jika belum pernah error)
     try:
-        files = data.get("files", [])
-        logs = data.get("logs", [])
-        filename, ext_real = os.path.splitext(file.file_name)
-        timestamp = int(time.time() * 1000)
-        unique_name = f"{filename}_{timestamp}{ext_real}"
-        file_path = os.path.join(DATA_DIR, unique_name)
-        await bot.download(file, destination=file_path)
-        files.append((file_path, file.file_name, message.message_id))
-        logs.append((message.message_id, f"bot: File {file.file_name} diterima"))
-        await state.update_data(files=files, logs=logs)
-        # Pesan /done hanya muncul jika ini file valid pertama DAN tidak ada file_error di state
-        # Cek ulang state setelah update
-        state_now = await state.get_data()
-        if len(state_now.get("files", [])) == 1 and not state_now.get("file_error"):
+        # CSV dikonversi streaming saat /done, format lain diparsing di background
+        derive = None if ext == ".csv" else txt_numbers
+        total = await receive_upload(message, state, bot, parser=file_parser(ext), derive=derive, derive_args=(ext,))
+        if total == 1:
             bot_msg = "✅ File diterima. Ketik /done untuk lanjut."
             await message.answer(bot_msg)
             log_bot(bot_msg)
@@ -171,30 +154,45 @@ async def to_txt_done(message: types.Message, state: FSMContext):
     # Cetak log penerimaan file sesuai urutan upload user
     for _, log_msg in logs:
         logging.info(log_msg)
+    await run_queued(message, process_txt, message, state, files)
+
+async def process_txt(message: types.Message, state: FSMContext, files):
     file_paths_to_delete = []
     try:
         for file_path, original_filename, _ in files:
             logging.info(f"user: proses file {os.path.basename(file_path)}")
-            if not os.path.exists(file_path):
+            # Upload dari cache parsing tidak punya file di disk
+            if not is_cached(file_path) and not os.path.exists(file_path):
                 logging.error(f"File tidak ditemukan: {file_path}")
                 await message.answer(f"⚠️ File tidak ditemukan: {os.path.basename(file_path)}")
                 continue
-            numbers = await extract_numbers(file_path)
-            logging.info(f"extract_numbers result: {len(numbers)} nomor ditemukan")
-            if not numbers:
+            base_name, _ = os.path.splitext(original_filename)
+            output_name = f"{base_name}.txt"
+            output_path = os.path.join(DATA_DIR, output_name)
+            is_csv = file_path.lower().endswith(".csv")
+            if is_csv:
+                # CSV dibaca per chunk dan langsung ditulis ke file hasil
+                total, output = await run_job(convert_csv_to_txt, file_path, output_path)
+                file_paths_to_delete.append(output_path)
+            else:
+                _, ext = os.path.splitext(original_filename.lower())
+                numbers = await take_parsed(file_path, file_parser(ext), txt_numbers, ext)
+                total = len(numbers)
+            logging.info(f"extract_numbers result: {total} nomor ditemukan")
+            if not total:
                 bot_msg = f"⚠️ Tidak ada nomor di {original_filename}."
                 await message.answer(bot_msg)
                 log_bot(bot_msg)
                 continue
-            base_name, _ = os.path.splitext(original_filename)
-            output_name = f"{base_name}.txt"
-            output_path = os.path.join(DATA_DIR, output_name)
-            # Tulis file txt dengan retry
-            await write_txt_file(output_path, "\n".join(numbers))
-            logging.info(f"File hasil ditulis: {output_path}")
-            await retry_send_document(message, output_path, output_name)
+            if not is_csv:
+                # Nomor (uint64 ringkas) ditulis di job executor; hasil kecil kembali sebagai bytes
+                output = await run_job(write_txt_numbers, numbers, output_path)
+            if isinstance(output, str):
+                logging.info(f"File hasil ditulis: {output_path}")
+            await retry_send_document(message, output, output_name)
             log_bot(f"kirim file {output_name}")
-            file_paths_to_delete.append(output_path)
+            if output_path not in file_paths_to_delete:
+                file_paths_to_delete.append(output_path)
         bot_msg = "📤 File berhasil dikirim!"
         await message.answer(bot_msg)
         log_bot(bot_msg)
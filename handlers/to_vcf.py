@@ -1,18 +1,20 @@
 import logging
 import os
-import time
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.types import FSInputFile
 from aiogram.filters import Command
-from utils import file_naming, contact_naming, file as file_utils, format as format_utils
+from utils import file_naming, contact_naming, format as format_utils
 from utils.retry_send import retry_send_document  # Tambahan import retry
-from managemen.membership import check_membership, send_membership_message, delete_join_message
+from utils.executor import run_job, run_pipeline
+from utils.scheduler import run_queued
+from utils.upload import receive_upload, mark_file_error, take_parsed
+from utils.number_cleaner import PackedNumbers
+from utils.file import file_parser
+from utils.blocklist import blocklist_size, filter_blocked
 import asyncio
-from managemen.status import save_user
 from managemen.data_file import log_file_upload
-from managemen.message import save_user_for_broadcast
 
 router = Router()
 
@@ -61,13 +63,6 @@ async def help_from_vcf(message: types.Message, state: FSMContext):
 # Handler utama
 @router.message(Command("to_vcf"), F.chat.type == "private")
 async def to_vcf_start(message: types.Message, state: FSMContext):
-    save_user_for_broadcast(message.from_user)
-    save_user(message.from_user.username)
-    in_group, in_channel = await check_membership(message.bot, message.from_user.id)
-    if not (in_group and in_channel):
-        await send_membership_message(message, in_group, in_channel)
-        return
-    await delete_join_message(message.bot, message.from_user.id, message.chat.id)
     log_user(message)
     bot_msg = "📥 Kirim file .txt atau .xlsx"
     await message.answer(bot_msg)
@@ -92,7 +87,7 @@ async def to_vcf_receive_file(message: types.Message, state: FSMContext, bot):
 
     # Jika ada file salah format, set flag error, kirim error, dan JANGAN proses apapun lagi
     if ext not in allowed_ext:
-        await state.update_data(files=[], logs=[], file_error=True)
+        await mark_file_error(state)
         bot_msg = "❌ Format file tidak didukung!\nKetik /to_vcf untuk mulai ulang."
         await message.answer(bot_msg)
         log_bot(bot_msg)
@@ -100,19 +95,9 @@ async def to_vcf_receive_file(message: types.Message, state: FSMContext, bot):
 
     # File valid, proses seperti biasa (hanya jika belum pernah error)
     try:
-        files = data.get("files", [])
-        logs = data.get("logs", [])
-        filename, ext_real = os.path.splitext(file.file_name)
-        timestamp = int(time.time() * 1000)
-        unique_name = f"{filename}_{timestamp}{ext_real}"
-        file_path = os.path.join(DATA_DIR, unique_name)
-        await bot.download(file, destination=file_path)
-        files.append((file_path, file.file_name, message.message_id))
-        logs.append((message.message_id, f"bot: File {file.file_name} diterima"))
-        await state.update_data(files=files, logs=logs)
-        # Pesan /done hanya muncul jika ini file valid pertama DAN tidak ada file_error di state
-        state_now = await state.get_data()
-        if len(state_now.get("files", [])) == 1 and not state_now.get("file_error"):
+        # Nomor langsung diparsing di background begitu download selesai
+        total = await receive_upload(message, state, bot, parser=file_parser(ext), derive=PackedNumbers.unique)
+        if total == 1:
             bot_msg = "✅ File diterima. Ketik /done untuk lanjut."
             await message.answer(bot_msg)
             log_bot(bot_msg)
@@ -254,16 +239,41 @@ async def to_vcf_split_choice(message: types.Message, state: FSMContext):
     if text == "semua":
         await state.update_data(split="all")
         log_bot("Proses semua kontak dalam satu file.")
-        await process_vcf(message, state)
+        await run_queued(message, process_vcf, message, state)
     elif text.isdigit() and int(text) > 0:
         await state.update_data(split=int(text))
         log_bot(f"Pecah kontak per {text} kontak.")
-        await process_vcf(message, state)
+        await run_queued(message, process_vcf, message, state)
     else:
         bot_msg = "⚠️ Input salah. Ketik 'semua' atau jumlah kontak per file."
         await message.answer(bot_msg)
         log_bot(bot_msg)
 
+def write_vcf_part(output_path, numbers, contactname, file_idx=0, total_files=1, start=1):
+    """
+    Buat nama kontak dan tulis satu file vcf (dijalankan di job executor).
+    start: nomor urut kontak pertama (dipakai split 1 file yang penomorannya lanjut antar part).
+    Return isi file (bytes) atau output_path jika file besar sudah ditulis ke disk.
+    """
+    if start != 1:
+        contact_names = [f"{contactname} {i+start:02d}" for i in range(len(numbers))]
+    else:
+        contact_names = contact_naming.generate_contact_names(contactname, len(numbers), file_idx=file_idx, total_files=total_files)
+    return format_utils.write_vcf(output_path, contact_names, numbers)
+
+async def take_allowed(file_path, original_filename, user_id):
+    """
+    Ambil nomor hasil parsing (bisa dari cache) lalu buang nomor yang ada di blocklist user.
+    Return (nomor, jumlah nomor di blocklist).
+    """
+    _, ext = os.path.splitext(original_filename.lower())
+    numbers = await take_parsed(file_path, file_parser(ext), PackedNumbers.unique)
+    # Blocklist difilter setelah cache supaya perubahan blocklist langsung berlaku
+    if not numbers or not blocklist_size(user_id):
+        return numbers, 0
+    allowed = await run_job(filter_blocked, numbers, user_id)
+    return allowed, len(numbers) - len(allowed)
+
 async def process_vcf(message: types.Message, state: FSMContext):
     data = await state.get_data()
     files = data.get("files", [])
@@ -272,82 +282,70 @@ async def process_vcf(message: types.Message, state: FSMContext):
     split = data.get("split", "all")
 
     file_paths_to_delete = []
-    try:
-        file_paths = [f[0] for f in files]
-        original_names = [f[1] for f in files]
+    total_blocked = 0
+
+    async def write_part(output_name, *args, **kwargs):
+        if not output_name.lower().endswith('.vcf'):
+            output_name += ".vcf"
+        output_path = os.path.join(DATA_DIR, output_name)
+        file_paths_to_delete.append(output_path)
+        output = await run_job(write_vcf_part, output_path, *args, **kwargs)
+        return "file", output, output_name
+
+    async def parts():
+        """Yield part vcf (job tulis) dan pesan peringatan sesuai urutan kirim ke chat."""
+        nonlocal total_blocked
         if split == "all":
-            file_names = file_naming.generate_file_names(filename, len(file_paths), split_mode="all")
+            file_names = file_naming.generate_file_names(filename, len(files), split_mode="all")
             for idx, (file_path, original_filename, _) in enumerate(files):
                 logging.info(f"user: proses file {os.path.basename(file_path)}")
-                numbers = await file_utils.extract_numbers(file_path)
-                numbers = list(dict.fromkeys(numbers))
-                if not numbers:
-                    bot_msg = f"⚠️ Tidak ada nomor di {original_filename}."
-                    await message.answer(bot_msg)
-                    log_bot(bot_msg)
-                    continue
-                contact_names = contact_naming.generate_contact_names(contactname, len(numbers), file_idx=idx, total_files=len(files))
-                output_name = file_names[idx]
-                if not output_name.lower().endswith('.vcf'):
-                    output_name += ".vcf"
-                vcf_content = format_utils.create_vcf_content(contact_names, numbers)
-                output_path = os.path.join(DATA_DIR, output_name)
-                await format_utils.write_vcf_file(output_path, vcf_content)
-                await retry_send_document(message, output_path, output_name)
-                log_bot(f"kirim file {output_name}")
-                file_paths_to_delete.append(output_path)
-        else:
-            split = int(split)
-            part_counts = []
-            numbers_list = []
-            for file_path, original_filename, _ in files:
-                numbers = await file_utils.extract_numbers(file_path)
-                numbers = list(dict.fromkeys(numbers))
-                numbers_list.append(numbers)
-                total = len(numbers)
-                part_total = (total + split - 1) // split
-                part_counts.append(part_total)
-            file_names = file_naming.generate_file_names(filename, len(files), part_counts=part_counts, split_mode=split)
-            idx_name = 0
-            for file_idx, numbers in enumerate(numbers_list):
+                numbers, blocked = await take_allowed(file_path, original_filename, message.from_user.id)
+                total_blocked += blocked
                 if not numbers:
-                    bot_msg = f"⚠️ Tidak ada nomor di {original_names[file_idx]}."
-                    await message.answer(bot_msg)
-                    log_bot(bot_msg)
+                    yield "pesan", f"⚠️ Tidak ada nomor di {original_filename}."
                     continue
-                part_total = part_counts[file_idx]
+                yield write_part(file_names[idx], numbers, contactname, file_idx=idx, total_files=len(files))
+            return
+        split_size = int(split)
+        part_counts = []
+        numbers_list = []
+        for file_path, original_filename, _ in files:
+            numbers, blocked = await take_allowed(file_path, original_filename, message.from_user.id)
+            total_blocked += blocked
+            numbers_list.append(numbers)
+            part_counts.append((len(numbers) + split_size - 1) // split_size)
+        file_names = file_naming.generate_file_names(filename, len(files), part_counts=part_counts, split_mode=split_size)
+        idx_name = 0
+        for file_idx, numbers in enumerate(numbers_list):
+            if not numbers:
+                yield "pesan", f"⚠️ Tidak ada nomor di {files[file_idx][1]}."
+                continue
+            nomor_awal = 1
+            for part_idx in range(part_counts[file_idx]):
+                part_numbers = numbers[part_idx*split_size:(part_idx+1)*split_size]
+                output_name = file_names[idx_name]
+                idx_name += 1
                 if len(files) == 1:
-                    nomor_awal = 1
-                    for part_idx in range(part_total):
-                        part_numbers = numbers[part_idx*split:(part_idx+1)*split]
-                        contact_names = [f"{contactname} {i+nomor_awal:02d}" for i in range(1, len(part_numbers)+1)]
-                        output_name = file_names[idx_name]
-                        idx_name += 1
-                        if not output_name.lower().endswith('.vcf'):
-                            output_name += ".vcf"
-                        vcf_content = format_utils.create_vcf_content(contact_names, part_numbers)
-                        output_path = os.path.join(DATA_DIR, output_name)
-                        await format_utils.write_vcf_file(output_path, vcf_content)
-                        await retry_send_document(message, output_path, output_name)
-                        log_bot(f"kirim file {output_name}")
-                        file_paths_to_delete.append(output_path)
-                        nomor_awal += len(part_numbers)
+                    yield write_part(output_name, part_numbers, contactname, start=nomor_awal + 1)
+                    nomor_awal += len(part_numbers)
                 else:
-                    label = contact_naming._alphabet_label(file_idx)
-                    for part_idx in range(part_total):
-                        part_numbers = numbers[part_idx*split:(part_idx+1)*split]
-                        contact_names = [f"{contactname} {label} {i+1:02d}" for i in range(len(part_numbers))]
-                        output_name = file_names[idx_name]
-                        idx_name += 1
-                        if not output_name.lower().endswith('.vcf'):
-                            output_name += ".vcf"
-                        vcf_content = format_utils.create_vcf_content(contact_names, part_numbers)
-                        output_path = os.path.join(DATA_DIR, output_name)
-                        await format_utils.write_vcf_file(output_path, vcf_content)
-                        await retry_send_document(message, output_path, output_name)
-                        log_bot(f"kirim file {output_name}")
-                        file_paths_to_delete.append(output_path)
+                    yield write_part(output_name, part_numbers, contactname, file_idx=file_idx, total_files=len(files))
+
+    async def send(item):
+        if item[0] == "pesan":
+            await message.answer(item[1])
+            log_bot(item[1])
+            return
+        _, output, output_name = item
+        await retry_send_document(message, output, output_name)
+        log_bot(f"kirim file {output_name}")
+
+    try:
+        # Part berikutnya ditulis di job executor selagi part sebelumnya diupload
+        await run_pipeline(parts(), send)
         bot_msg = "📤 File berhasil dikirim!"
+        if total_blocked:
+            bot_msg += f"\n🚫 {total_blocked} nomor di blocklist tidak dimasukkan."
         await message.answer(bot_msg)
         log_bot(bot_msg)
     except Exception as e:
@@ -2,14 +2,16 @@ import logging
 import os
 import sys
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 from config import BOT_TOKEN
 from handlers import (
     to_vcf, done, start, to_txt, admin, manual, add, delete,
-    renamectc, renamefile, merge, split, count, nodup,
+    renamectc, renamefile, merge, split, count, nodup, blocklist,
 )
 from managemen import clear_data, status, message
-from managemen import clean_system_message
+from managemen import clean_system_message, registry, membership
+from managemen.middleware import MembershipMiddleware, UploadSessionMiddleware
+from utils import executor
+from utils.storage import create_storage
 
 # Setup logging tanpa tanggal/waktu, pastikan log info tampil di terminal
 logging.basicConfig(
@@ -27,15 +29,22 @@ logging.getLogger("aiogram.dispatcher.dispatcher").setLevel(logging.WARNING)
 os.makedirs("data", exist_ok=True)
 os.makedirs("managemen", exist_ok=True)
 
-# Reset user_log.txt setiap bot dijalankan (agar /status hanya menampilkan user aktif di sesi ini)
-user_log_path = os.path.join("managemen", "user_log.txt")
-with open(user_log_path, "w", encoding="utf-8") as f:
-    pass  # Kosongkan file
+def reset_user_log():
+    # Reset user_log.txt setiap bot dijalankan (agar /status hanya menampilkan user aktif di sesi ini)
+    # Dipanggil dari main() supaya proses worker job executor tidak ikut mengosongkan file
+    status.user_log.reset()
 
 async def main():
     logging.info("Bot is starting...")
+    reset_user_log()
     bot = Bot(token=BOT_TOKEN)
-    dp = Dispatcher(storage=MemoryStorage())
+    dp = Dispatcher(storage=create_storage())
+
+    # Catat user dan cek membership sekali per pesan, sebelum handler mana pun
+    dp.message.outer_middleware(MembershipMiddleware())
+    # Parsing awal file dari sesi yang sudah selesai / dibatalkan dibuang setelah tiap update
+    dp.message.outer_middleware(UploadSessionMiddleware())
+    dp.callback_query.outer_middleware(UploadSessionMiddleware())
 
     # Register routers
     dp.include_router(start.router)
@@ -49,6 +58,7 @@ async def main():
     dp.include_router(split.router)
     dp.include_router(count.router)
     dp.include_router(nodup.router)
+    dp.include_router(blocklist.router)
     dp.include_router(done.router)
     dp.include_router(clear_data.router)
     dp.include_router(status.router)
@@ -56,8 +66,17 @@ async def main():
     dp.include_router(manual.router)
     dp.include_router(message.router)
     dp.include_router(clean_system_message.router)
+    dp.include_router(membership.router)
+
+    # Broadcast yang terputus karena restart dilanjutkan otomatis
+    dp.startup.register(message.resume_broadcast)
 
-    await dp.start_polling(bot)
+    try:
+        # allowed_updates dari handler terdaftar supaya update chat_member ikut diterima
+        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+    finally:
+        executor.shutdown()
+        registry.flush_all()
     logging.info("Bot stopped.")
 
 if __name__ == "__main__":
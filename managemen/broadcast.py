@@ -0,0 +1,189 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest
+from config import BROADCAST_RATE, BROADCAST_CONCURRENCY, BROADCAST_PROGRESS_INTERVAL
+
+# Progress broadcast yang sedang jalan, dipakai untuk lanjut otomatis setelah bot restart
+PROGRESS_FILE = "managemen/broadcast.json"
+
+_task = None
+
+class RateLimiter:
+    """Batasi jumlah pesan per detik untuk semua worker; bisa di-pause saat kena flood wait."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / max(rate, 0.1)
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            delay = self._next - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next = max(self._next, loop.time()) + self.interval
+
+    def pause(self, seconds):
+        loop = asyncio.get_running_loop()
+        self._next = max(self._next, loop.time() + seconds)
+
+def is_running():
+    return _task is not None and not _task.done()
+
+def _save_progress(job):
+    tmp_path = PROGRESS_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(job, f, ensure_ascii=False)
+    os.replace(tmp_path, PROGRESS_FILE)
+
+def _load_progress():
+    if not os.path.exists(PROGRESS_FILE):
+        return None
+    try:
+        with open(PROGRESS_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logging.error(f"Progress broadcast rusak, diabaikan: {e}")
+        return None
+
+def _progress_text(job, rate, done=False):
+    total = len(job["users"])
+    processed = job["sent"] + job["failed"] + len(job["blocked"])
+    head = "✅ Broadcast selesai" if done else "📣 Broadcast berjalan"
+    return (
+        f"{head}: {processed}/{total}\n"
+        f"Terkirim: {job['sent']}\n"
+        f"Gagal: {job['failed']}\n"
+        f"Blokir bot: {len(job['blocked'])}\n"
+        f"Kecepatan: {rate:.1f} pesan/detik"
+    )
+
+async def _send(bot, user_id, text, limiter):
+    """Kirim satu pesan. Return "sent", "blocked" atau "failed"."""
+    while True:
+        await limiter.wait()
+        try:
+            await bot.send_message(int(user_id), text)
+            return "sent"
+        except TelegramRetryAfter as e:
+            logging.warning(f"Flood wait {e.retry_after} detik saat broadcast")
+            limiter.pause(e.retry_after)
+        except TelegramForbiddenError:
+            return "blocked"
+        except Exception as e:
+            logging.warning(f"Gagal kirim ke {user_id}: {e}")
+            return "failed"
+
+async def _report(bot, job, rate, done=False):
+    text = _progress_text(job, rate, done)
+    try:
+        if job.get("progress_message_id"):
+            await bot.edit_message_text(text, chat_id=job["chat_id"], message_id=job["progress_message_id"])
+        else:
+            sent = await bot.send_message(job["chat_id"], text)
+            job["progress_message_id"] = sent.message_id
+    except TelegramBadRequest:
+        pass  # Pesan tidak berubah / sudah dihapus admin
+    except Exception as e:
+        logging.warning(f"Gagal update progress broadcast: {e}")
+
+async def _run(bot, job, registry):
+    """
+    Kirim ke semua user mulai dari job["cursor"] dengan konkurensi terbatas.
+    cursor hanya maju jika semua user sebelumnya sudah diproses, jadi saat resume
+    paling banyak BROADCAST_CONCURRENCY user bisa menerima pesan dua kali.
+    """
+    users = job["users"]
+    limiter = RateLimiter(BROADCAST_RATE)
+    sem = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+    finished = set()
+    start_processed = job["sent"] + job["failed"] + len(job["blocked"])
+    started = time.monotonic()
+
+    def rate():
+        processed = job["sent"] + job["failed"] + len(job["blocked"]) - start_processed
+        return processed / max(time.monotonic() - started, 1e-6)
+
+    async def worker(idx, user_id):
+        try:
+            result = await _send(bot, user_id, job["text"], limiter)
+        finally:
+            sem.release()
+        if result == "blocked":
+            job["blocked"].append(user_id)
+        else:
+            job[result] += 1
+        finished.add(idx)
+        while job["cursor"] in finished:
+            finished.discard(job["cursor"])
+            job["cursor"] += 1
+
+    async def reporter():
+        while True:
+            await asyncio.sleep(BROADCAST_PROGRESS_INTERVAL)
+            await asyncio.to_thread(_save_progress, dict(job, blocked=list(job["blocked"])))
+            await _report(bot, job, rate())
+
+    await _report(bot, job, 0.0)
+    report_task = asyncio.create_task(reporter())
+    tasks = set()
+    try:
+        for idx in range(job["cursor"], len(users)):
+            await sem.acquire()
+            task = asyncio.create_task(worker(idx, users[idx]))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+    finally:
+        report_task.cancel()
+    # Hapus user yang memblokir bot supaya broadcast berikutnya tidak membuang kuota
+    # (sekali di akhir, file registry ditulis ulang di thread)
+    pruned = await registry.remove(job["blocked"]) if job["blocked"] else 0
+    await _report(bot, job, rate(), done=True)
+    if pruned:
+        await bot.send_message(job["chat_id"], f"🧹 {pruned} user yang memblokir bot dihapus dari daftar.")
+    if os.path.exists(PROGRESS_FILE):
+        os.remove(PROGRESS_FILE)
+    logging.info(f"Broadcast selesai: {job['sent']} terkirim, {job['failed']} gagal, {len(job['blocked'])} blokir")
+
+def _start(bot, job, registry):
+    global _task
+    _task = asyncio.create_task(_run(bot, job, registry))
+    _task.add_done_callback(_log_result)
+    return _task
+
+def _log_result(task):
+    if not task.cancelled() and task.exception():
+        logging.error(f"Broadcast berhenti karena error: {task.exception()}")
+
+def start_broadcast(bot, chat_id, text, registry):
+    """Mulai broadcast di background. Return False jika masih ada broadcast yang berjalan."""
+    if is_running():
+        return False
+    job = {
+        "chat_id": chat_id,
+        "text": text,
+        "users": registry.values(),
+        "cursor": 0,
+        "sent": 0,
+        "failed": 0,
+        "blocked": [],
+        "progress_message_id": None,
+    }
+    _save_progress(job)
+    _start(bot, job, registry)
+    return True
+
+def resume_broadcast(bot, registry):
+    """Lanjutkan broadcast yang terputus (dipanggil saat bot start)."""
+    job = _load_progress()
+    if job is None or is_running():
+        return False
+    logging.info(f"Lanjutkan broadcast dari user ke-{job['cursor'] + 1} dari {len(job['users'])}")
+    job["progress_message_id"] = None
+    _start(bot, job, registry)
+    return True
@@ -1,5 +1,6 @@
 from aiogram import Router, types
 import logging
+from managemen.membership import invalidate_membership
 
 router = Router()
 
@@ -7,11 +8,14 @@ router = Router()
 async def clean_system_message(message: types.Message):
     if message.chat.type in ("group", "supergroup"):
         if message.new_chat_members:
+            for user in message.new_chat_members:
+                invalidate_membership(user.id)
             try:
                 await message.delete()
             except Exception as e:
                 logging.error(f"Failed to delete join message: {e}")
         if message.left_chat_member:
+            invalidate_membership(message.left_chat_member.id)
             try:
                 await message.delete()
             except Exception as e:
@@ -1,4 +1,7 @@
-from aiogram import Bot, types
+import asyncio
+import time
+from aiogram import Bot, Router, types
+from config import MEMBERSHIP_CACHE_TTL, MEMBERSHIP_NEGATIVE_TTL
 
 GROUP_LINK = "https://t.me/+RbL9QMFO47M4YmI1"
 CHANNEL_LINK = "https://t.me/+hW94C6eF1Bk1Y2I1"
@@ -8,23 +11,53 @@ CHANNEL_ID = -1002314507632
 # Simpan message_id pesan join per user (hanya untuk sesi bot berjalan)
 join_message_ids = {}
 
-async def check_membership(bot: Bot, user_id: int):
-    in_group = False
-    in_channel = False
-    try:
-        gr = await bot.get_chat_member(GROUP_ID, user_id)
-        if gr.status in ("member", "administrator", "creator"):
-            in_group = True
-    except Exception:
-        pass
+router = Router()
+
+# Cache hasil cek membership: user_id -> (waktu kedaluwarsa, in_group, in_channel)
+membership_cache = {}
+# Entry kedaluwarsa dibuang saat menyimpan entry baru, paling sering sekali per interval ini (detik)
+_next_prune = 0.0
+
+async def _is_member(bot: Bot, chat_id: int, user_id: int):
     try:
-        ch = await bot.get_chat_member(CHANNEL_ID, user_id)
-        if ch.status in ("member", "administrator", "creator"):
-            in_channel = True
+        member = await bot.get_chat_member(chat_id, user_id)
+        return member.status in ("member", "administrator", "creator")
     except Exception:
-        pass
+        return False
+
+def _prune_cache(now):
+    global _next_prune
+    if now < _next_prune:
+        return
+    _next_prune = now + MEMBERSHIP_NEGATIVE_TTL
+    for user_id in [uid for uid, cached in membership_cache.items() if cached[0] <= now]:
+        del membership_cache[user_id]
+
+async def check_membership(bot: Bot, user_id: int):
+    now = time.monotonic()
+    cached = membership_cache.get(user_id)
+    if cached and cached[0] > now:
+        return cached[1], cached[2]
+    # Cek grup dan channel bersamaan
+    in_group, in_channel = await asyncio.gather(
+        _is_member(bot, GROUP_ID, user_id),
+        _is_member(bot, CHANNEL_ID, user_id),
+    )
+    # Hasil negatif di-cache lebih singkat supaya user yang baru join cepat terdeteksi
+    ttl = MEMBERSHIP_CACHE_TTL if in_group and in_channel else MEMBERSHIP_NEGATIVE_TTL
+    _prune_cache(now)
+    membership_cache[user_id] = (now + ttl, in_group, in_channel)
     return in_group, in_channel
 
+def invalidate_membership(user_id: int):
+    membership_cache.pop(user_id, None)
+
+@router.chat_member()
+async def on_chat_member(event: types.ChatMemberUpdated):
+    # Status user di grup/channel berubah (join, keluar, kick): cek ulang di perintah berikutnya
+    if event.chat.id in (GROUP_ID, CHANNEL_ID):
+        invalidate_membership(event.new_chat_member.user.id)
+
 async def send_membership_message(message: types.Message, in_group: bool, in_channel: bool):
     keyboard = []
     if not in_group:
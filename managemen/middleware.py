@@ -0,0 +1,56 @@
+import logging
+from aiogram import BaseMiddleware, types
+from managemen.membership import check_membership, send_membership_message, delete_join_message
+from managemen.status import save_user
+from managemen.message import save_user_for_broadcast
+from utils.upload import sync_session
+
+# Perintah yang tidak perlu cek membership (admin / lanjutan proses yang sudah berjalan)
+UNGATED_COMMANDS = {"done", "message", "status", "clear_vcf"}
+
+def get_command(message: types.Message):
+    """Ambil nama perintah (tanpa / dan @bot) dari pesan, atau None jika bukan perintah."""
+    text = message.text or message.caption or ""
+    if not text.startswith("/"):
+        return None
+    return text.split(maxsplit=1)[0][1:].split("@", 1)[0].lower()
+
+class MembershipMiddleware(BaseMiddleware):
+    """
+    Outer middleware untuk pesan private: catat user (broadcast & log username) tiap update,
+    lalu cek membership grup/channel (pakai cache) sebelum perintah dijalankan.
+    Perintah baru otomatis ikut dicek kecuali ada di UNGATED_COMMANDS.
+    """
+
+    async def __call__(self, handler, event: types.Message, data):
+        if event.chat.type != "private" or event.from_user is None:
+            return await handler(event, data)
+        save_user_for_broadcast(event.from_user)
+        save_user(event.from_user.username)
+        command = get_command(event)
+        if command is None or command in UNGATED_COMMANDS:
+            return await handler(event, data)
+        in_group, in_channel = await check_membership(event.bot, event.from_user.id)
+        if not (in_group and in_channel):
+            logging.info(f"user {event.from_user.id} belum join, perintah /{command} ditolak")
+            await send_membership_message(event, in_group, in_channel)
+            return None
+        await delete_join_message(event.bot, event.from_user.id, event.chat.id)
+        return await handler(event, data)
+
+class UploadSessionMiddleware(BaseMiddleware):
+    """
+    Outer middleware (pesan & callback): setelah handler selesai, parsing awal file upload
+    yang sudah tidak tercatat di state sesi (sesi selesai / di-reset / ganti perintah) dibuang.
+    """
+
+    async def __call__(self, handler, event, data):
+        try:
+            return await handler(event, data)
+        finally:
+            state = data.get("state")
+            if state is not None:
+                try:
+                    await sync_session(state)
+                except Exception as e:
+                    logging.error(f"Gagal bersihkan parsing awal sesi: {e}")
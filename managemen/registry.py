@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import os
+import threading
+from config import REGISTRY_FLUSH_INTERVAL
+
+# Semua registry yang dibuat, supaya bisa di-flush sekaligus saat bot berhenti
+_registries = []
+
+class UserRegistry:
+    """
+    Daftar user unik (urutan pertama kali tercatat) yang dibaca dari file sekali saja.
+    Cek dan tambah user O(1) di memori; user baru ditulis append ke file per batch.
+    Format file tetap satu user per baris.
+    """
+
+    def __init__(self, path, normalize=None, flush_interval=REGISTRY_FLUSH_INTERVAL):
+        self.path = path
+        self.normalize = normalize
+        self.flush_interval = flush_interval
+        self._users = None
+        self._pending = []
+        self._flusher = None
+        self._rewriting = False
+        self._lock = threading.Lock()
+        _registries.append(self)
+
+    def _load(self):
+        if self._users is not None:
+            return self._users
+        users = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    value = line.strip()
+                    if value:
+                        users[self.normalize(value) if self.normalize else value] = None
+        self._users = users
+        return users
+
+    def add(self, value):
+        """Catat user. Return True jika user baru."""
+        if self.normalize:
+            value = self.normalize(value)
+        users = self._load()
+        if value in users:
+            return False
+        users[value] = None
+        self._pending.append(value)
+        self._schedule_flush()
+        return True
+
+    def __contains__(self, value):
+        return (self.normalize(value) if self.normalize else value) in self._load()
+
+    def __len__(self):
+        return len(self._load())
+
+    def values(self):
+        return list(self._load())
+
+    def _schedule_flush(self):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Dipanggil di luar event loop: langsung tulis
+            self.flush()
+            return
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        while self._pending:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                logging.error(f"Gagal simpan {self.path}: {e}")
+
+    def flush(self):
+        """Tulis user baru yang belum tersimpan (append) ke file."""
+        with self._lock:
+            if self._rewriting:
+                return  # File sedang ditulis ulang, user baru ditulis di flush berikutnya
+            pending, self._pending = self._pending, []
+            if not pending:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("".join(value + "\n" for value in pending))
+            except Exception:
+                # Kembalikan supaya dicoba lagi di flush berikutnya
+                self._pending[:0] = pending
+                raise
+
+    async def remove(self, values):
+        """
+        Hapus sekumpulan user dari registry sekaligus; file ditulis ulang (atomik) sekali di thread.
+        Return jumlah yang dihapus.
+        """
+        if self.normalize:
+            values = [self.normalize(v) for v in values]
+        users = self._load()
+        removed = [v for v in set(values) if v in users]
+        if not removed:
+            return 0
+        with self._lock:
+            for value in removed:
+                del users[value]
+            # User tertunda ikut tertulis di file baru; yang tercatat setelah ini menunggu rewrite selesai
+            snapshot = list(users)
+            self._pending = []
+            self._rewriting = True
+        await asyncio.to_thread(self._rewrite, snapshot)
+        return len(removed)
+
+    def _rewrite(self, values):
+        with self._lock:
+            try:
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write("".join(value + "\n" for value in values))
+                os.replace(tmp_path, self.path)
+            finally:
+                self._rewriting = False
+
+    def reset(self):
+        """Kosongkan registry dan file-nya."""
+        with self._lock:
+            self._pending = []
+            self._users = {}
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "w", encoding="utf-8"):
+                pass
+
+def flush_all():
+    """Tulis semua user yang masih tertunda (dipanggil saat bot berhenti)."""
+    for registry in _registries:
+        try:
+            registry.flush()
+        except Exception as e:
+            logging.error(f"Gagal simpan {registry.path}: {e}")
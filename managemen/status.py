@@ -1,8 +1,8 @@
 from aiogram import Router, types
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
-import os
 import logging
+from managemen.registry import UserRegistry
 
 router = Router()
 
@@ -10,22 +10,14 @@ router = Router()
 ADMIN_USERNAMES = ["KazuhaID02"]
 
 USER_LOG_FILE = "managemen/user_log.txt"
+# Username unik (huruf kecil), file hanya dibaca sekali
+user_log = UserRegistry(USER_LOG_FILE, normalize=str.lower)
 
 def save_user(username):
     if not username:
         return
-    username = username.lower()
-    os.makedirs("managemen", exist_ok=True)
     try:
-        # Simpan username unik saja
-        if os.path.exists(USER_LOG_FILE):
-            with open(USER_LOG_FILE, "r", encoding="utf-8") as f:
-                users = set(line.strip().lower() for line in f if line.strip())
-        else:
-            users = set()
-        if username not in users:
-            with open(USER_LOG_FILE, "a", encoding="utf-8") as f:
-                f.write(username + "\n")
+        user_log.add(username)
     except Exception as e:
         logging.error(f"Gagal simpan user log: {e}")
 
@@ -36,13 +28,7 @@ async def status_handler(message: types.Message, state: FSMContext):
         await message.answer("Kamu tidak punya akses untuk perintah ini.")
         return
 
-    # Baca user log
-    if not os.path.exists(USER_LOG_FILE):
-        await message.answer("Belum ada pengguna yang tercatat.")
-        return
-
-    with open(USER_LOG_FILE, "r", encoding="utf-8") as f:
-        users = [line.strip() for line in f if line.strip()]
+    users = user_log.values()
     if not users:
         await message.answer("Belum ada pengguna yang tercatat.")
         return
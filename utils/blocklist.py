@@ -0,0 +1,104 @@
+import logging
+import os
+import time
+import numpy as np
+from config import BLOCKLIST_DIR
+from utils.number_index import NumberIndex
+
+# Blocklist per user disimpan sebagai array uint64 terurut (key pack_number, little-endian),
+# 8 byte per nomor, dibaca dengan mmap tanpa parsing.
+# Nomor lebih dari MAX_PACKED_DIGITS digit tidak bisa masuk blocklist.
+
+def blocklist_path(user_id):
+    return os.path.join(BLOCKLIST_DIR, f"{user_id}.bin")
+
+def blocklist_size(user_id):
+    path = blocklist_path(user_id)
+    return os.path.getsize(path) // 8 if os.path.exists(path) else 0
+
+def open_blocklist(user_id):
+    """Buka blocklist user sebagai NumberIndex (mmap, read-only), atau None jika kosong."""
+    if user_id is None:
+        return None
+    path = blocklist_path(user_id)
+    if not os.path.exists(path) or os.path.getsize(path) < 8:
+        return None
+    index = NumberIndex()
+    index.keys = np.memmap(path, dtype="<u8", mode="r")
+    return index
+
+def exclude_blocked(records, user_id, number_of=None):
+    """Buang record yang nomornya ada di blocklist user (streaming, lihat NumberIndex.exclude)."""
+    index = open_blocklist(user_id)
+    if index is None:
+        return records
+    return index.exclude(records, number_of=number_of)
+
+class BlockedFilter:
+    """
+    exclude_blocked yang menghitung record yang dibuang, untuk dilaporkan ke user.
+    Satu filter bisa dipakai untuk beberapa file; blocked = total sejak filter dibuat.
+    """
+
+    def __init__(self, user_id):
+        self.index = open_blocklist(user_id)
+
+    @property
+    def blocked(self):
+        return self.index.excluded if self.index is not None else 0
+
+    def exclude(self, records, number_of=None):
+        if self.index is None:
+            return records
+        return self.index.exclude(records, number_of=number_of)
+
+def filter_blocked(numbers, user_id):
+    """Buang nomor (PackedNumbers) yang ada di blocklist user."""
+    index = open_blocklist(user_id)
+    if index is None or not len(numbers):
+        return numbers
+    return numbers.select(~index.contains_numbers(numbers))
+
+def _read_keys(user_id):
+    index = open_blocklist(user_id)
+    return np.empty(0, dtype=np.uint64) if index is None else np.array(index.keys, dtype=np.uint64)
+
+def _write_keys(user_id, keys, max_retry=3, delay=1):
+    """Tulis ulang blocklist secara atomik (file sementara lalu os.replace)."""
+    path = blocklist_path(user_id)
+    os.makedirs(BLOCKLIST_DIR, exist_ok=True)
+    if not len(keys):
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    tmp_path = path + ".tmp"
+    keys.astype("<u8").tofile(tmp_path)
+    for attempt in range(1, max_retry + 1):
+        try:
+            os.replace(tmp_path, path)
+            return
+        except PermissionError as e:
+            # Di Windows file yang sedang di-mmap job lain belum bisa diganti
+            logging.error(f"Gagal simpan blocklist {path}: {e} (percobaan {attempt})")
+            if attempt == max_retry:
+                raise
+            time.sleep(delay)
+
+def add_to_blocklist(user_id, numbers):
+    """Tambah nomor (PackedNumbers) ke blocklist user. Return (jumlah nomor baru, total)."""
+    old = _read_keys(user_id)
+    new = np.unique(numbers.keys)
+    new = new[new != 0]
+    merged = np.union1d(old, new)
+    _write_keys(user_id, merged)
+    return len(merged) - len(old), len(merged)
+
+def remove_from_blocklist(user_id, numbers):
+    """Hapus nomor (PackedNumbers) dari blocklist user. Return (jumlah yang dihapus, total)."""
+    old = _read_keys(user_id)
+    kept = np.setdiff1d(old, numbers.keys, assume_unique=False)
+    _write_keys(user_id, kept)
+    return len(old) - len(kept), len(kept)
+
+def clear_blocklist(user_id):
+    _write_keys(user_id, np.empty(0, dtype=np.uint64))
@@ -0,0 +1,73 @@
+import asyncio
+import functools
+import inspect
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from config import JOB_WORKERS, PIPELINE_DEPTH
+
+# Process pool bersama untuk semua handler (dibuat saat pertama dipakai)
+_pool = None
+
+def get_pool():
+    """Ambil process pool global. Return None jika JOB_WORKERS <= 0 (pakai thread default)."""
+    global _pool
+    if _pool is None and JOB_WORKERS > 0:
+        _pool = ProcessPoolExecutor(max_workers=JOB_WORKERS)
+        logging.info(f"Job executor aktif dengan {JOB_WORKERS} worker")
+    return _pool
+
+async def run_job(func, *args, **kwargs):
+    """
+    Jalankan fungsi CPU-bound (parse/transform/tulis file) di luar event loop.
+    func harus fungsi level modul supaya bisa dikirim ke proses worker.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(), functools.partial(func, *args, **kwargs))
+
+def shutdown():
+    """Matikan process pool saat bot berhenti."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+async def run_pipeline(items, consume, depth=PIPELINE_DEPTH):
+    """
+    Producer/consumer: item dari async iterator `items` (boleh awaitable, mis. run_job(...))
+    langsung dijalankan dan diantre maksimal `depth` item di depan, sementara consume(hasil)
+    dipanggil satu per satu sesuai urutan. Dipakai supaya generate part berikutnya jalan
+    bersamaan dengan upload part sebelumnya tanpa mengacak urutan kirim.
+    """
+    queue = asyncio.Queue(maxsize=max(1, depth))
+    done = object()
+    started = []
+
+    async def producer():
+        try:
+            async for item in items:
+                if inspect.isawaitable(item):
+                    item = asyncio.ensure_future(item)
+                    started.append(item)
+                await queue.put(item)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put(e)
+            return
+        await queue.put(done)
+
+    task = asyncio.create_task(producer())
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            if isinstance(item, asyncio.Future):
+                item = await item
+            await consume(item)
+    finally:
+        task.cancel()
+        # Tunggu job yang sudah terlanjur jalan supaya tidak ada file yang ditulis setelah cleanup
+        await asyncio.gather(task, *started, return_exceptions=True)
@@ -1,23 +1,20 @@
 import pandas as pd
 import logging
-import aiofiles
+import os
 import re
 import asyncio
-from utils.number_cleaner import extract_valid_numbers_from_lines
+from utils.number_cleaner import extract_valid_numbers_from_lines, normalize_series, iter_valid_numbers, PackedNumbers
+from utils.vcard import iter_vcf_numbers
+from utils.spreadsheet import iter_numbers_from_sheets
+from utils.executor import run_job
+from utils.output import SpooledOutput
 
 def extract_numbers_from_vcf(file_path, max_retry=3, delay=2):
     """Extract valid phone numbers from vcf file dengan retry."""
     for attempt in range(1, max_retry + 1):
         try:
-            numbers = []
-            with open(file_path, "r", encoding="utf-8") as f:
-                for line in f:
-                    if line.startswith("TEL"):
-                        nomor = line.split(":")[-1].strip()
-                        # Tetap validasi dan bersihkan nomor
-                        numbers.append(nomor)
-            # Terapkan validasi juga pada hasil vcf
-            numbers = extract_valid_numbers_from_lines(numbers)
+            # Tokenizer vcard streaming, nomor langsung divalidasi tanpa baca seluruh file
+            numbers = extract_valid_numbers_from_lines(iter_vcf_numbers(file_path))
             return numbers
         except Exception as e:
             logging.error(f"Error reading vcf: {e} (percobaan {attempt})")
@@ -26,17 +23,16 @@ def extract_numbers_from_vcf(file_path, max_retry=3, delay=2):
             import time
             time.sleep(delay)
 
+def read_numbers_from_txt(file_path):
+    """Baca file txt (satu nomor per baris) dan ambil nomor valid."""
+    with open(file_path, "r", encoding="utf-8") as f:
+        return extract_valid_numbers_from_lines(f)
+
 async def extract_numbers_from_txt(file_path, timeout=10, max_retry=3, delay=2):
-    """Extract valid phone numbers from txt file (one per line) asynchronously, dengan timeout dan retry."""
+    """Extract valid phone numbers from txt file (one per line) di job executor, dengan timeout dan retry."""
     for attempt in range(1, max_retry + 1):
         try:
-            lines = []
-            async def read_lines():
-                async with aiofiles.open(file_path, "r", encoding="utf-8") as f:
-                    async for line in f:
-                        lines.append(line)
-            await asyncio.wait_for(read_lines(), timeout=timeout)
-            numbers = extract_valid_numbers_from_lines(lines)
+            numbers = await asyncio.wait_for(run_job(read_numbers_from_txt, file_path), timeout=timeout)
             return numbers
         except asyncio.TimeoutError:
             logging.error(f"Timeout membaca file txt: {file_path} (percobaan {attempt})")
@@ -50,14 +46,48 @@ async def extract_numbers_from_txt(file_path, timeout=10, max_retry=3, delay=2):
             await asyncio.sleep(delay)
     return []
 
+CSV_CHUNKSIZE = 100_000
+
+def iter_numbers_from_csv(file_path, chunksize=CSV_CHUNKSIZE):
+    """
+    Baca kolom pertama csv per chunk (usecols=[0], dtype=str) dan yield list nomor valid per chunk.
+    Baris pertama ikut dibaca sebagai data (header=None): header teks otomatis gugur saat validasi,
+    csv tanpa header tidak kehilangan nomor pertamanya.
+    Memori tetap kecil berapapun ukuran file, hasil bisa langsung diteruskan ke writer.
+    """
+    try:
+        reader = pd.read_csv(file_path, usecols=[0], header=None, dtype=str, chunksize=chunksize)
+    except pd.errors.EmptyDataError:
+        return
+    with reader:
+        for chunk in reader:
+            # Normalisasi satu kolom sekaligus (vektor), bukan per item
+            numbers, _ = normalize_series(chunk.iloc[:, 0].dropna())
+            if not numbers.empty:
+                yield numbers.tolist()
+
+def write_numbers_stream(chunks, output_path):
+    """
+    Tulis nomor (iterable of list) ke file txt satu per baris secara streaming.
+    Return (jumlah nomor, isi output dalam bytes atau output_path jika sudah ditulis ke disk).
+    """
+    total = 0
+    out = SpooledOutput(output_path)
+    with out.text() as f:
+        for numbers in chunks:
+            if total:
+                f.write("\n")
+            f.write("\n".join(numbers))
+            total += len(numbers)
+    return total, out.result()
+
 def extract_numbers_from_csv(file_path, max_retry=3, delay=2):
     """Extract valid phone numbers from csv file (first column) dengan retry."""
     for attempt in range(1, max_retry + 1):
         try:
-            df = pd.read_csv(file_path)
-            col = df.columns[0]
-            numbers = df[col].astype(str).str.strip().tolist()
-            numbers = extract_valid_numbers_from_lines(numbers)
+            numbers = []
+            for chunk in iter_numbers_from_csv(file_path):
+                numbers.extend(chunk)
             return numbers
         except Exception as e:
             logging.error(f"Error reading csv: {e} (percobaan {attempt})")
@@ -70,16 +100,8 @@ def extract_numbers_from_csv(file_path, max_retry=3, delay=2):
 def extract_numbers_from_xlsx(file_path, max_retry=3, delay=2):
     for attempt in range(1, max_retry + 1):
         try:
-            numbers = []
-            xls = pd.ExcelFile(file_path)
-            for sheet_name in xls.sheet_names:
-                df = pd.read_excel(xls, sheet_name=sheet_name)
-                for col in df.columns:
-                    col_data = df[col].dropna().astype(str).str.strip().tolist()
-                    col_data = [x for x in col_data if x and x.lower() != "nan"]
-                    valid_numbers = extract_valid_numbers_from_lines(col_data)
-                    numbers.extend(valid_numbers)
-            numbers = list(dict.fromkeys(numbers))
+            # Reader read-only openpyxl, sel langsung dinormalisasi tanpa DataFrame
+            numbers = list(dict.fromkeys(iter_numbers_from_sheets(file_path)))
             # logging.info(f"DEBUG XLSX: total nomor valid dari semua kolom/sheet: {numbers}")  # HAPUS/COMMENT BARIS INI
             return numbers
         except Exception as e:
@@ -89,19 +111,124 @@ def extract_numbers_from_xlsx(file_path, max_retry=3, delay=2):
             import time
             time.sleep(delay)
 
+def convert_csv_to_txt(file_path, output_path):
+    """Tulis nomor valid dari csv ke file txt per chunk. Return (jumlah nomor, output) seperti write_numbers_stream."""
+    return write_numbers_stream(iter_numbers_from_csv(file_path), output_path)
+
+def extract_numbers_sync(file_path):
+    """Versi sinkron extract_numbers, dipakai di dalam job executor."""
+    if file_path.endswith(".txt"):
+        try:
+            return read_numbers_from_txt(file_path)
+        except Exception as e:
+            logging.error(f"Error reading txt: {e}")
+            return []
+    elif file_path.endswith(".csv"):
+        return extract_numbers_from_csv(file_path)
+    elif file_path.endswith(".xlsx") or file_path.endswith(".xls"):
+        return extract_numbers_from_xlsx(file_path)
+    elif file_path.endswith(".vcf"):
+        return extract_numbers_from_vcf(file_path)
+    else:
+        logging.error("Unsupported file type")
+        return []
+
+def _iter_line_numbers(file_path):
+    with open(file_path, "r", encoding="utf-8") as f:
+        yield from iter_valid_numbers(f)
+
+def _iter_csv_numbers(file_path):
+    for chunk in iter_numbers_from_csv(file_path):
+        yield from chunk
+
+def _iter_first_sheet_numbers(file_path):
+    yield from iter_numbers_from_sheets(file_path, first_only=True)
+
+def _iter_vcf_numbers(file_path):
+    yield from iter_valid_numbers(iter_vcf_numbers(file_path))
+
+# Cara membaca nomor dari file. Nama parser ikut jadi bagian key cache parsing, jadi isi file yang
+# sama dengan cara baca berbeda (mis. .txt vs .csv, /count vs /to_vcf) tidak berbagi hasil.
+NUMBER_PARSERS = {
+    "lines": _iter_line_numbers,             # satu nomor per baris
+    "csv": _iter_csv_numbers,                # kolom pertama csv
+    "sheets": iter_numbers_from_sheets,      # semua sheet, semua kolom
+    "first_sheet": _iter_first_sheet_numbers,
+    "vcf": _iter_vcf_numbers,
+}
+
+def _ext(file_path):
+    # Ekstensi file upload mengikuti nama aslinya (bisa huruf besar, mis. DATA.TXT)
+    return os.path.splitext(file_path.lower())[1]
+
+def file_parser(ext):
+    """Parser seperti extract_numbers_sync (/to_vcf, /to_txt, /delete): csv kolom pertama, xlsx semua sheet."""
+    if ext == ".csv":
+        return "csv"
+    if ext in (".xlsx", ".xls"):
+        return "sheets"
+    if ext == ".vcf":
+        return "vcf"
+    return "lines" if ext == ".txt" else None
+
+def line_parser(ext):
+    """Parser /count dan /nodup: xlsx sheet pertama, vcf nomor TEL, txt/csv/format lain per baris."""
+    if ext in (".xlsx", ".xls"):
+        return "first_sheet"
+    return "vcf" if ext == ".vcf" else "lines"
+
+def iter_numbers_sync(file_path, parser=None):
+    """Yield nomor valid dari file secara streaming (tanpa list). Default parser sesuai tipe file (file_parser)."""
+    parser = parser or file_parser(_ext(file_path))
+    if parser is None:
+        logging.error("Unsupported file type")
+        return
+    yield from NUMBER_PARSERS[parser](file_path)
+
+def pack_all_numbers(file_path, parser=None, max_retry=3, delay=2):
+    """
+    Semua nomor valid file sebagai PackedNumbers (uint64, 8 byte per nomor), urutan asli dan
+    duplikat tetap ada; bentuk yang disimpan di cache parsing. Error dilempar setelah percobaan terakhir.
+    """
+    for attempt in range(1, max_retry + 1):
+        try:
+            return PackedNumbers.from_iter(iter_numbers_sync(file_path, parser))
+        except Exception as e:
+            logging.error(f"Error reading {file_path}: {e} (percobaan {attempt})")
+            if attempt == max_retry:
+                raise
+            import time
+            time.sleep(delay)
+
+def unique_sheet_numbers(numbers, ext):
+    """Nomor dari xlsx tanpa duplikat (sama dengan extract_numbers_from_xlsx), format lain apa adanya."""
+    return numbers.unique() if ext in (".xlsx", ".xls") else numbers
+
+def pack_numbers_sync(file_path, max_retry=3, delay=2):
+    """
+    Sama dengan extract_numbers_sync tapi hasilnya PackedNumbers (uint64, 8 byte per nomor).
+    Nomor langsung di-pack saat dibaca, tidak pernah ada list string sebesar file.
+    """
+    try:
+        numbers = pack_all_numbers(file_path, max_retry=max_retry, delay=delay)
+    except Exception:
+        return PackedNumbers()
+    return unique_sheet_numbers(numbers, _ext(file_path))
+
+def extract_unique_numbers(file_path):
+    """Extract nomor lalu buang duplikat (urutan tetap), sekali jalan di job executor. Return PackedNumbers."""
+    return pack_numbers_sync(file_path).unique()
+
 async def extract_numbers(file_path):
-    """Detect file type and extract numbers."""
+    """Detect file type and extract numbers (parse dijalankan di job executor)."""
     if file_path.endswith(".txt"):
         return await extract_numbers_from_txt(file_path)
     elif file_path.endswith(".csv"):
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, extract_numbers_from_csv, file_path)
+        return await run_job(extract_numbers_from_csv, file_path)
     elif file_path.endswith(".xlsx") or file_path.endswith(".xls"):
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, extract_numbers_from_xlsx, file_path)
+        return await run_job(extract_numbers_from_xlsx, file_path)
     elif file_path.endswith(".vcf"):
-        loop = asyncio.get_running_loop()
-        return await loop.run_in_executor(None, extract_numbers_from_vcf, file_path)
+        return await run_job(extract_numbers_from_vcf, file_path)
     else:
         logging.error("Unsupported file type")
         return []
@@ -1,25 +1,56 @@
-import aiofiles
-import asyncio
-import logging
+from utils.output import SpooledOutput
+
+# Ukuran potongan (karakter) yang dikumpulkan sebelum ditulis ke file
+WRITE_CHUNK_SIZE = 64 * 1024
+
+def vcf_card(name, number):
+    """Satu kontak dalam format vcf."""
+    return f"BEGIN:VCARD\nVERSION:3.0\nFN:{name}\nTEL;TYPE=CELL:{number}\nEND:VCARD"
+
+def iter_vcf_cards(contact_names, numbers):
+    """Yield kartu vcf satu per satu dari pasangan nama dan nomor."""
+    for name, number in zip(contact_names, numbers):
+        yield vcf_card(name, number)
 
 def create_vcf_content(contact_names, numbers):
     """Create vcf content from contact names and numbers."""
-    vcf_entries = []
-    for name, number in zip(contact_names, numbers):
-        vcf_entries.append(
-            f"BEGIN:VCARD\nVERSION:3.0\nFN:{name}\nTEL;TYPE=CELL:{number}\nEND:VCARD"
-        )
-    return "\n".join(vcf_entries)
+    return "\n".join(iter_vcf_cards(contact_names, numbers))
+
+def write_chunked(f, texts, chunk_size=WRITE_CHUNK_SIZE):
+    """
+    Tulis teks (kartu vcf, baris txt) dipisah newline ke file biner f,
+    dikumpulkan per potongan ~chunk_size lalu di-encode utf-8 sekali per potongan.
+    Return jumlah byte yang ditulis.
+    """
+    written = 0
+    buf = []
+    size = 0
+    first = True
+    for text in texts:
+        if first:
+            first = False
+        else:
+            buf.append("\n")
+            size += 1
+        buf.append(text)
+        size += len(text)
+        if size >= chunk_size:
+            chunk = "".join(buf).encode("utf-8")
+            f.write(chunk)
+            written += len(chunk)
+            buf = []
+            size = 0
+    if buf:
+        chunk = "".join(buf).encode("utf-8")
+        f.write(chunk)
+        written += len(chunk)
+    return written
 
-async def write_vcf_file(output_path, vcf_content, max_retry=3, delay=2):
-    """Write vcf content to file asynchronously dengan retry."""
-    for attempt in range(1, max_retry + 1):
-        try:
-            async with aiofiles.open(output_path, "w", encoding="utf-8") as f:
-                await f.write(vcf_content)
-            return True
-        except Exception as e:
-            logging.error(f"Error writing vcf: {e} (percobaan {attempt})")
-            if attempt == max_retry:
-                raise
-            await asyncio.sleep(delay)
\ No newline at end of file
+def write_vcf(output_path, contact_names, numbers):
+    """
+    Buat dan tulis file vcf secara streaming (dipakai di job executor).
+    Return isi file (bytes) jika kecil, atau output_path jika sudah ditulis ke disk.
+    """
+    out = SpooledOutput(output_path)
+    write_chunked(out, iter_vcf_cards(contact_names, numbers))
+    return out.result()
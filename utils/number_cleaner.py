@@ -1,4 +1,14 @@
 import re
+from array import array
+import numpy as np
+import pandas as pd
+
+# Semua karakter selain angka (sama dengan [^\d] yang dipakai sebelumnya)
+_NON_DIGIT = re.compile(r"\D")
+
+MIN_DIGITS = 8
+# Nomor (digit ASCII) sampai 18 digit muat di uint64 sebagai int("1" + digit); angka 1 di depan menjaga nol awal
+MAX_PACKED_DIGITS = 18
 
 def clean_and_validate_number(line):
     """
@@ -12,18 +22,132 @@ def clean_and_validate_number(line):
     line = line.strip()
     if not line:
         return None
-    # Hapus semua karakter kecuali angka dan +
-    if line.startswith("+"):
-        # Pertahankan + di depan, sisanya hanya angka
-        nomor = "+" + re.sub(r"[^\d]", "", line[1:])
-    else:
-        nomor = re.sub(r"[^\d]", "", line)
-        nomor = "+" + nomor
+    # Dengan atau tanpa + di awal hasilnya sama: "+" diikuti semua angka
+    digits = _NON_DIGIT.sub("", line)
     # Validasi: minimal 8 digit angka (tanpa +)
-    digit_count = len(re.sub(r"[^\d]", "", nomor))
-    if digit_count < 8:
+    if len(digits) < MIN_DIGITS:
         return None
-    return nomor
+    return "+" + digits
+
+def pack_number(nomor):
+    """
+    Ubah nomor valid ("+digit") jadi int yang muat di uint64, atau None jika terlalu panjang
+    atau berisi digit non-ASCII (mis. ٠٨١٢), supaya teks aslinya tidak berubah saat di-unpack.
+    """
+    digits = nomor[1:]
+    if len(digits) > MAX_PACKED_DIGITS or not digits.isascii():
+        return None
+    return int("1" + digits)
+
+def unpack_number(key):
+    """Kebalikan pack_number: int -> "+digit"."""
+    return "+" + str(int(key))[1:]
+
+# Jumlah key yang diubah ke int Python sekaligus saat iterasi PackedNumbers
+_UNPACK_CHUNK = 64 * 1024
+
+class PackedNumbers:
+    """
+    Daftar nomor yang ringkas: tiap nomor disimpan sebagai uint64 (pack_number), 8 byte per nomor
+    dan murah dikirim antar proses. Nomor yang terlalu panjang diberi key 0 dan disimpan di
+    dict overflow {posisi: nomor}. Iterasi, len dan slicing bekerja seperti list string "+digit".
+    """
+
+    __slots__ = ("keys", "overflow")
+
+    def __init__(self, keys=None, overflow=None):
+        self.keys = np.empty(0, dtype=np.uint64) if keys is None else keys
+        self.overflow = overflow if overflow is not None else {}
+
+    @classmethod
+    def from_iter(cls, numbers):
+        """Pack nomor valid satu per satu (tanpa menyimpan list string)."""
+        buf = array("Q")
+        overflow = {}
+        for i, nomor in enumerate(numbers):
+            key = pack_number(nomor)
+            if key is None:
+                overflow[i] = nomor
+                key = 0
+            buf.append(key)
+        return cls(np.frombuffer(buf, dtype=np.uint64).copy(), overflow)
+
+    @classmethod
+    def concat(cls, *parts):
+        keys = np.concatenate([part.keys for part in parts]) if parts else None
+        overflow = {}
+        offset = 0
+        for part in parts:
+            for i, nomor in part.overflow.items():
+                overflow[offset + i] = nomor
+            offset += len(part)
+        return cls(keys, overflow)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        overflow = self.overflow
+        for start in range(0, len(self.keys), _UNPACK_CHUNK):
+            for i, key in enumerate(self.keys[start:start + _UNPACK_CHUNK].tolist(), start):
+                yield overflow[i] if key == 0 else "+" + str(key)[1:]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("PackedNumbers hanya mendukung slice tanpa step")
+            overflow = {i - start: nomor for i, nomor in self.overflow.items() if start <= i < stop}
+            return PackedNumbers(self.keys[start:stop], overflow)
+        key = int(self.keys[index])
+        return self.overflow[index % len(self)] if key == 0 else unpack_number(key)
+
+    def tolist(self):
+        return list(self)
+
+    def select(self, mask):
+        """Ambil nomor dengan mask boolean, urutan tetap."""
+        overflow = {}
+        if self.overflow:
+            positions = np.cumsum(mask) - 1
+            overflow = {int(positions[i]): nomor for i, nomor in self.overflow.items() if mask[i]}
+        return PackedNumbers(self.keys[mask], overflow)
+
+    def unique(self):
+        """Buang duplikat, kemunculan pertama dipertahankan (sama dengan dict.fromkeys)."""
+        keep = np.zeros(len(self), dtype=bool)
+        _, first = np.unique(self.keys, return_index=True)
+        keep[first] = True
+        if self.overflow:
+            keep[list(self.overflow)] = False
+            seen = set()
+            for i, nomor in self.overflow.items():
+                if nomor not in seen:
+                    seen.add(nomor)
+                    keep[i] = True
+        return self.select(keep)
+
+    def isin(self, other):
+        """Mask nomor yang ada di other (PackedNumbers atau iterable nomor), vektor."""
+        if not isinstance(other, PackedNumbers):
+            other = PackedNumbers.from_iter(other)
+        mask = np.isin(self.keys, other.keys[other.keys != 0])
+        if self.overflow:
+            others = set(other.overflow.values())
+            for i, nomor in self.overflow.items():
+                mask[i] = nomor in others
+        return mask
+
+def iter_valid_numbers(lines):
+    """Yield nomor valid dari baris-baris (streaming)."""
+    for line in lines:
+        nomor = clean_and_validate_number(line)
+        if nomor:
+            yield nomor
+
+def pack_valid_numbers(lines):
+    """Seperti extract_valid_numbers_from_lines, tapi hasilnya PackedNumbers."""
+    return PackedNumbers.from_iter(iter_valid_numbers(lines))
 
 def extract_valid_numbers_from_lines(lines):
     """
@@ -34,4 +158,25 @@ def extract_valid_numbers_from_lines(lines):
         nomor = clean_and_validate_number(line)
         if nomor:
             numbers.append(nomor)
-    return numbers
\ No newline at end of file
+    return numbers
+
+def normalize_series(series):
+    """
+    Versi vektor dari clean_and_validate_number untuk satu kolom pandas.
+    Return (Series nomor valid dengan index asli, mask boolean valid).
+    """
+    digits = series.astype(str).str.replace(_NON_DIGIT.pattern, "", regex=True)
+    valid = digits.str.len() >= MIN_DIGITS
+    return "+" + digits[valid], valid
+
+def normalize_many(lines):
+    """
+    Bersihkan banyak baris sekaligus, hasil identik dengan clean_and_validate_number per baris.
+    Return (list nomor valid sesuai urutan, list index baris yang ditolak).
+    """
+    series = pd.Series(list(lines), dtype=object)
+    if series.empty:
+        return [], []
+    numbers, valid = normalize_series(series)
+    rejected_idx = [int(i) for i in (~valid).to_numpy().nonzero()[0]]
+    return numbers.tolist(), rejected_idx
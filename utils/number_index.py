@@ -0,0 +1,173 @@
+import numpy as np
+from utils.number_cleaner import PackedNumbers
+
+# Jumlah nomor yang dicek ke index sekaligus (vektor)
+CHUNK_SIZE = 256 * 1024
+
+def _isin_sorted(sorted_keys, keys):
+    """Mask keys yang ada di array terurut sorted_keys (searchsorted, tanpa hash set)."""
+    if not len(sorted_keys) or not len(keys):
+        return np.zeros(len(keys), dtype=bool)
+    idx = np.searchsorted(sorted_keys, keys)
+    idx[idx == len(sorted_keys)] = 0
+    return sorted_keys[idx] == keys
+
+def _merge_sorted(a, b):
+    """Gabung dua array terurut yang tidak beririsan secara linear (searchsorted + insert)."""
+    return np.insert(a, np.searchsorted(a, b), b)
+
+def iter_chunks(records, size=CHUNK_SIZE):
+    """Kelompokkan iterable jadi list berukuran size."""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class NumberIndex:
+    """
+    Himpunan nomor yang ringkas: nomor disimpan sebagai uint64 di array NumPy terurut
+    (8 byte per nomor, bukan ~60 byte per string di set Python).
+    Nomor lebih dari MAX_PACKED_DIGITS digit (jarang) disimpan di set biasa.
+    Nomor yang ditambah belakangan disimpan di beberapa run terurut yang lebih kecil (lihat add).
+    """
+
+    def __init__(self):
+        self.keys = np.empty(0, dtype=np.uint64)  # run terbesar
+        self._runs = []  # run terurut lain, ukurannya menurun (tiap run > 2x run berikutnya)
+        self.overflow = set()
+        self.excluded = 0  # jumlah record yang dibuang exclude()
+
+    @classmethod
+    def from_numbers(cls, numbers):
+        """Bangun index dari PackedNumbers (duplikat otomatis dibuang)."""
+        index = cls()
+        keys = np.unique(numbers.keys)
+        index.keys = keys[keys != 0]
+        index.overflow = set(numbers.overflow.values())
+        return index
+
+    def __len__(self):
+        return len(self.keys) + sum(len(run) for run in self._runs) + len(self.overflow)
+
+    def contains(self, keys):
+        mask = _isin_sorted(self.keys, keys)
+        for run in self._runs:
+            mask |= _isin_sorted(run, keys)
+        return mask
+
+    def contains_numbers(self, numbers):
+        """Mask PackedNumbers yang ada di index."""
+        mask = self.contains(numbers.keys)
+        for i, nomor in numbers.overflow.items():
+            mask[i] = nomor in self.overflow
+        return mask
+
+    def exclude(self, records, number_of=None):
+        """
+        Yield record yang nomornya tidak ada di index, streaming per chunk (urutan tetap).
+        number_of(record) -> nomor valid atau None; record tanpa nomor selalu lolos.
+        Default record itu sendiri adalah nomornya.
+        """
+        for batch in iter_chunks(records):
+            numbers = [number_of(record) for record in batch] if number_of else batch
+            positions = [i for i, nomor in enumerate(numbers) if nomor]
+            found = self.contains_numbers(PackedNumbers.from_iter(numbers[i] for i in positions))
+            drop = np.zeros(len(batch), dtype=bool)
+            drop[np.asarray(positions, dtype=np.intp)[found]] = True
+            self.excluded += int(found.sum())
+            for record, dropped in zip(batch, drop.tolist()):
+                if not dropped:
+                    yield record
+
+    def add(self, keys):
+        """
+        Tambah keys (unik dan belum ada di index) sebagai run terurut baru. Run digabung dengan
+        run sebelumnya selama ukurannya sebanding (seperti binary counter), jadi tiap nomor hanya
+        ikut digabung O(log N) kali dan jumlah run yang dicek contains tetap O(log N).
+        """
+        if not len(keys):
+            return
+        run = np.sort(keys)
+        while self._runs and len(self._runs[-1]) <= 2 * len(run):
+            run = _merge_sorted(self._runs.pop(), run)
+        if len(self.keys) <= 2 * len(run):
+            self.keys = _merge_sorted(self.keys, run)
+        else:
+            self._runs.append(run)
+
+    def update(self, other):
+        """Gabungkan index lain (yang tidak beririsan) ke index ini."""
+        for run in (other.keys, *other._runs):
+            self.add(run)
+        self.overflow |= other.overflow
+
+class DedupCounter:
+    """
+    Dedup lintas file: tiap nomor hanya lolos sekali di semua file.
+    Duplikat dihitung per file (nomor sudah muncul di file yang sama)
+    dan lintas file (nomor sudah muncul di file sebelumnya).
+    """
+
+    def __init__(self):
+        self.seen = NumberIndex()   # nomor dari file-file sebelumnya
+        self.current = NumberIndex()  # nomor dari file yang sedang diproses
+        self.file_dupes = 0
+        self.cross_dupes = 0
+
+    def start_file(self):
+        self.seen.update(self.current)
+        self.current = NumberIndex()
+        self.file_dupes = 0
+        self.cross_dupes = 0
+
+    def _keep_mask(self, numbers):
+        """Mask nomor (list string) yang lolos, dan catat yang duplikat."""
+        packed = PackedNumbers.from_iter(numbers)
+        keep = np.zeros(len(packed), dtype=bool)
+        for i, nomor in packed.overflow.items():
+            if nomor in self.current.overflow:
+                self.file_dupes += 1
+            elif nomor in self.seen.overflow:
+                self.cross_dupes += 1
+                self.current.overflow.add(nomor)
+            else:
+                self.current.overflow.add(nomor)
+                keep[i] = True
+        positions = packed.keys.nonzero()[0]
+        if not len(positions):
+            return keep
+        keys = packed.keys[positions]
+        uniq, first = np.unique(keys, return_index=True)
+        in_file = self.current.contains(uniq)
+        in_seen = self.seen.contains(uniq) & ~in_file
+        new = ~in_file & ~in_seen
+        # Kemunculan ulang dalam chunk ini selalu duplikat per file
+        self.file_dupes += len(keys) - len(uniq) + int(in_file.sum())
+        self.cross_dupes += int(in_seen.sum())
+        keep[positions[first[new]]] = True
+        self.current.add(uniq[~in_file])
+        return keep
+
+    def filter(self, records, number_of=None, keep_missing=False):
+        """
+        Yield record yang nomornya belum pernah muncul, urutan asli dipertahankan.
+        number_of(record) -> nomor valid atau None (record tanpa nomor dibuang,
+        kecuali keep_missing); default record itu sendiri adalah nomornya.
+        """
+        if not keep_missing:
+            records = (record for record in records if (number_of(record) if number_of else record))
+        for batch in iter_chunks(records):
+            numbers = [number_of(record) for record in batch] if number_of else batch
+            if keep_missing:
+                positions = [i for i, nomor in enumerate(numbers) if nomor]
+                keep = np.ones(len(batch), dtype=bool)
+                keep[np.asarray(positions, dtype=np.intp)] = self._keep_mask([numbers[i] for i in positions])
+            else:
+                keep = self._keep_mask(numbers)
+            for record, ok in zip(batch, keep.tolist()):
+                if ok:
+                    yield record
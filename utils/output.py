@@ -0,0 +1,71 @@
+import io
+from config import SEND_MEMORY_LIMIT
+
+class SpooledOutput(io.RawIOBase):
+    """
+    File output yang ditampung di memori selama ukurannya <= max_size,
+    lalu otomatis dipindah ke output_path (disk) jika melebihi batas.
+    Bisa dipakai langsung untuk file biner (xlsx) atau lewat text() untuk vcf/txt.
+    """
+
+    def __init__(self, output_path, max_size=SEND_MEMORY_LIMIT):
+        super().__init__()
+        self.output_path = output_path
+        self.max_size = max_size
+        self.rolled = False
+        self._file = io.BytesIO()
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        return self._file.readinto(b)
+
+    def write(self, b):
+        if not self.rolled and self._file.tell() + memoryview(b).nbytes > self.max_size:
+            self.rollover()
+        return self._file.write(b)
+
+    def seek(self, pos, whence=io.SEEK_SET):
+        return self._file.seek(pos, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def truncate(self, size=None):
+        return self._file.truncate(size)
+
+    def flush(self):
+        if self.rolled and not self._file.closed:
+            self._file.flush()
+
+    def rollover(self):
+        """Pindahkan isi buffer ke output_path, tulisan berikutnya langsung ke disk."""
+        if self.rolled:
+            return
+        pos = self._file.tell()
+        f = open(self.output_path, "w+b")
+        f.write(self._file.getbuffer())
+        f.seek(pos)
+        self._file = f
+        self.rolled = True
+
+    def close(self):
+        if self.rolled and not self._file.closed:
+            self._file.close()
+        super().close()
+
+    def text(self, encoding="utf-8"):
+        """Bungkus jadi file teks (mode "w") di atas output ini."""
+        return io.TextIOWrapper(io.BufferedWriter(self), encoding=encoding)
+
+    def result(self):
+        """Tutup output lalu return isinya: bytes jika masih di memori, atau path file jika sudah dipindah ke disk."""
+        self.close()
+        return self.output_path if self.rolled else self._file.getvalue()
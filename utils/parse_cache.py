@@ -0,0 +1,219 @@
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+import numpy as np
+from config import PARSE_CACHE_DIR, PARSE_CACHE_MAX_BYTES
+from utils.number_cleaner import PackedNumbers
+from utils.file import pack_all_numbers
+
+# Cache hasil parsing upload di disk: satu array .npy per (hash isi file, parser) berisi semua nomor
+# valid file menurut parser itu (urutan asli, duplikat tetap, key PackedNumbers; parser lihat
+# utils.file.NUMBER_PARSERS). Tiap perintah menurunkan hasilnya sendiri dari array ini (jumlah,
+# nomor unik, dst), jadi perintah dengan cara baca yang sama berbagi entry.
+# Key entry: "<hash>_<parser>". file_unique_id Telegram dipetakan ke hash supaya upload ulang
+# tidak perlu didownload.
+# Index entry (ukuran, urutan LRU, pemetaan id, pin) hanya ada di proses utama; job executor
+# cukup membaca/menulis file entry. Entry yang masih dipakai sesi (pin) tidak ikut dibuang.
+
+ID_DIR = os.path.join(PARSE_CACHE_DIR, "ids")
+# Path pengganti file upload yang tidak didownload karena isinya sudah ada di cache
+CACHED_PREFIX = "cache:"
+
+_entries = OrderedDict()  # key entry -> ukuran byte, urutan dari yang paling lama tidak dipakai
+_ids = {}                 # file_unique_id -> digest
+_pins = {}                # key entry -> jumlah upload sesi yang memakai
+_index = {"loaded": False, "total": 0}
+
+def file_digest(file_path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def entry_key(digest, parser):
+    return f"{digest}_{parser}"
+
+def _key_digest(key):
+    return key.split("_", 1)[0]
+
+def entry_path(key):
+    return os.path.join(PARSE_CACHE_DIR, f"{key}.npy")
+
+def cached_path(key, message_id):
+    """Path upload yang diambil dari cache (unik per pesan, tidak ada di disk)."""
+    return f"{CACHED_PREFIX}{key}:{message_id}"
+
+def cached_key(path):
+    """Key entry cache dari path hasil cached_path, atau None jika path file upload biasa."""
+    if not path.startswith(CACHED_PREFIX):
+        return None
+    return path[len(CACHED_PREFIX):].split(":", 1)[0]
+
+def all_numbers(numbers):
+    """Turunan tanpa perubahan: semua nomor file (PackedNumbers)."""
+    return numbers
+
+# --- Dijalankan di job executor ---
+
+def _load(key):
+    return PackedNumbers(np.load(entry_path(key)))
+
+def _store(key, numbers):
+    """Simpan array nomor. Return ukuran entry, atau None jika tidak disimpan."""
+    if numbers.overflow:
+        return None  # Nomor terlalu panjang / digit non-ASCII (jarang) tidak di-cache
+    path = entry_path(key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, numbers.keys)
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+def parse_job(file_path, unique_id, parser, derive, *args):
+    """
+    Ambil semua nomor file menurut parser (dari cache jika isi file yang sama sudah pernah diparsing
+    dengan parser itu, kalau belum parsing lalu simpan), hasil akhirnya derive(nomor, *args).
+    Return (key entry, ukuran entry atau None jika tidak ada di cache, hasil derive).
+    """
+    numbers = size = key = None
+    try:
+        digest = file_digest(file_path)
+        key = entry_key(digest, parser)
+    except OSError as e:
+        logging.error(f"Cache parsing tidak bisa dipakai untuk {file_path}: {e}")
+    if key is not None:
+        try:
+            numbers = _load(key)
+            size = os.path.getsize(entry_path(key))
+        except (OSError, ValueError):
+            numbers = None
+    if numbers is None:
+        numbers = _parse(file_path, parser)
+        if numbers is None:
+            return key, None, derive(PackedNumbers(), *args)
+        if key is not None:
+            try:
+                os.makedirs(ID_DIR, exist_ok=True)
+                size = _store(key, numbers)
+            except Exception as e:
+                logging.error(f"Gagal simpan cache parsing {file_path}: {e}")
+    if unique_id and size is not None:
+        try:
+            with open(os.path.join(ID_DIR, unique_id), "w", encoding="utf-8") as f:
+                f.write(digest)
+        except OSError as e:
+            logging.error(f"Gagal simpan id cache parsing {unique_id}: {e}")
+    return key, size, derive(numbers, *args)
+
+def _parse(file_path, parser):
+    """Nomor file menurut parser, atau None jika file gagal dibaca (hasil kosong tidak di-cache)."""
+    try:
+        return pack_all_numbers(file_path, parser)
+    except Exception as e:
+        logging.error(f"Gagal parsing {file_path}: {e}")
+        return None
+
+def load_job(key, derive, *args):
+    """derive(nomor entry cache, *args) untuk upload yang tidak didownload."""
+    return derive(_load(key), *args)
+
+# --- Index di proses utama ---
+
+def _load_index():
+    """Bangun index dari isi folder cache, sekali saat pertama dipakai."""
+    if _index["loaded"]:
+        return
+    _index["loaded"] = True
+    os.makedirs(ID_DIR, exist_ok=True)
+    found = []
+    for entry in os.scandir(PARSE_CACHE_DIR):
+        if entry.is_file() and entry.name.endswith(".npy"):
+            if "_" not in entry.name:
+                _remove(entry.path)  # Entry format lama (tanpa nama parser)
+                continue
+            st = entry.stat()
+            found.append((st.st_mtime, entry.name[:-4], st.st_size))
+    for _, key, size in sorted(found):
+        _entries[key] = size
+        _index["total"] += size
+    digests = {_key_digest(key) for key in _entries}
+    for entry in os.scandir(ID_DIR):
+        try:
+            with open(entry.path, "r", encoding="utf-8") as f:
+                digest = f.read().strip()
+        except OSError:
+            continue
+        if digest in digests:
+            _ids[entry.name] = digest
+        else:
+            _remove(entry.path)
+    _evict()
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def lookup(unique_id, parser):
+    """Key entry cache file_unique_id Telegram untuk parser (ditandai baru dipakai), atau None."""
+    _load_index()
+    digest = _ids.get(unique_id)
+    if digest is None:
+        return None
+    key = entry_key(digest, parser)
+    if key not in _entries:
+        return None
+    _entries.move_to_end(key)
+    try:
+        os.utime(entry_path(key))  # Urutan LRU tetap benar setelah bot start ulang
+    except OSError:
+        pass
+    return key
+
+def remember(unique_id, key, size):
+    """Catat hasil parse_job di index lalu buang entry lama jika cache melebihi batas."""
+    if key is None or size is None:
+        return
+    _load_index()
+    _index["total"] += size - _entries.get(key, 0)
+    _entries[key] = size
+    _entries.move_to_end(key)
+    if unique_id:
+        _ids[unique_id] = _key_digest(key)
+    _evict()
+
+def pin(key):
+    """Tahan entry supaya tidak dibuang selama sesi upload masih memakainya."""
+    _pins[key] = _pins.get(key, 0) + 1
+
+def unpin(key):
+    count = _pins.get(key, 0) - 1
+    if count > 0:
+        _pins[key] = count
+    else:
+        _pins.pop(key, None)
+
+def _evict():
+    """Buang entry paling lama tidak dipakai (kecuali yang di-pin) sampai total <= PARSE_CACHE_MAX_BYTES."""
+    if _index["total"] <= PARSE_CACHE_MAX_BYTES:
+        return
+    evicted = False
+    for key, size in list(_entries.items()):
+        if _index["total"] <= PARSE_CACHE_MAX_BYTES:
+            break
+        if key in _pins:
+            continue
+        _remove(entry_path(key))
+        del _entries[key]
+        _index["total"] -= size
+        evicted = True
+    if not evicted:
+        return
+    # Pemetaan file_unique_id ke hash yang sudah tidak punya entry ikut dihapus
+    digests = {_key_digest(key) for key in _entries}
+    for unique_id in [uid for uid, digest in _ids.items() if digest not in digests]:
+        del _ids[unique_id]
+        _remove(os.path.join(ID_DIR, unique_id))
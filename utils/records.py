@@ -0,0 +1,127 @@
+import os
+import re
+import numpy as np
+from utils.vcard import parse_vcards
+
+# Record mentah file teks: kartu (.vcf) atau baris (.txt/.csv).
+# Batas record dicari per potongan file biner (regex / numpy), tanpa parsing isi record,
+# supaya file besar bisa dibagi jadi rentang byte yang diproses terpisah.
+
+READ_SIZE = 1024 * 1024
+# Awal kartu: baris BEGIN:VCARD (spasi di depan diabaikan, sama seperti parse_vcards)
+CARD_START = re.compile(rb"^[ \t]*BEGIN:VCARD", re.IGNORECASE | re.MULTILINE)
+# Jalur cepat (literal, di potongan yang sudah di-upper) untuk kartu yang tidak menjorok
+_CARD_LINE = re.compile(rb"\nBEGIN:VCARD")
+
+def _iter_chunks(file_path, read_size=READ_SIZE):
+    """Yield (offset, potongan bytes) file, potongan selalu berakhir di akhir baris."""
+    with open(file_path, "rb") as f:
+        base = 0
+        rest = b""
+        while True:
+            block = f.read(read_size)
+            data = rest + block
+            if block:
+                cut = data.rfind(b"\n") + 1
+                chunk, rest = data[:cut], data[cut:]
+            else:
+                chunk, rest = data, b""
+            if chunk:
+                yield base, chunk
+                base += len(chunk)
+            if not block:
+                return
+
+def _count_marks(chunk, ext):
+    """Jumlah penanda record di potongan: awal kartu (.vcf) atau newline (txt/csv)."""
+    if ext == ".vcf":
+        up = chunk.upper()
+        total = up.count(b"\nBEGIN:VCARD") + up.startswith(b"BEGIN:VCARD")
+        # Regex hanya dipakai jika ada BEGIN:VCARD yang menjorok / bukan di awal baris
+        if total != up.count(b"BEGIN:VCARD"):
+            total = len(CARD_START.findall(chunk))
+        return total
+    return chunk.count(b"\n")
+
+def _marks(chunk, ext):
+    """Offset penanda record di potongan. .vcf: awal tiap kartu, txt/csv: setelah tiap newline."""
+    if ext == ".vcf":
+        up = chunk.upper()
+        marks = [m.start() + 1 for m in _CARD_LINE.finditer(up)]
+        if up.startswith(b"BEGIN:VCARD"):
+            marks.insert(0, 0)
+        if len(marks) != up.count(b"BEGIN:VCARD"):
+            marks = [m.start() for m in CARD_START.finditer(chunk)]
+        return marks
+    return np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == 10) + 1
+
+def _ends_without_newline(file_path):
+    size = os.path.getsize(file_path)
+    if not size:
+        return False
+    with open(file_path, "rb") as f:
+        f.seek(size - 1)
+        return f.read(1) != b"\n"
+
+def count_records(file_path, ext):
+    """Jumlah kartu (.vcf) atau baris (txt/csv) tanpa parsing isi file."""
+    total = sum(_count_marks(chunk, ext) for _, chunk in _iter_chunks(file_path))
+    if ext != ".vcf" and _ends_without_newline(file_path):
+        total += 1  # Baris terakhir tanpa newline
+    return total
+
+def count_tel_lines(file_path):
+    """Jumlah baris property TEL di file .vcf (termasuk yang ber-prefix grup, mis. item1.TEL) tanpa parsing kartu."""
+    total = 0
+    for _, chunk in _iter_chunks(file_path):
+        up = chunk.upper()
+        # Potongan selalu diawali awal baris
+        total += up.startswith(b"TEL;") or up.startswith(b"TEL:")
+        total += sum(up.count(marker) for marker in (b"\nTEL;", b"\nTEL:", b".TEL;", b".TEL:"))
+    return total
+
+def record_ranges(file_path, ext, sizes):
+    """
+    Bagi file jadi rentang byte (start, end) berurutan: rentang ke-i berisi sizes[i] record.
+    Satu pass baca file; offset penanda hanya dicari di potongan yang berisi batas part.
+    """
+    if len(sizes) < 2:
+        return [(0, os.path.getsize(file_path))] if sizes else []
+    cuts = np.cumsum(sizes)[:-1]
+    # Batas setelah n record: txt = akhir baris ke-n, vcf = awal kartu ke-(n+1)
+    targets = cuts - 1 if ext != ".vcf" else cuts
+    offsets = []
+    seen = 0
+    for base, chunk in _iter_chunks(file_path):
+        n = _count_marks(chunk, ext)
+        if targets[len(offsets)] < seen + n:
+            marks = _marks(chunk, ext)
+            while len(offsets) < len(targets) and targets[len(offsets)] < seen + n:
+                offsets.append(base + int(marks[targets[len(offsets)] - seen]))
+        seen += n
+        if len(offsets) == len(targets):
+            break
+    bounds = [0] + offsets + [os.path.getsize(file_path)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def _iter_range_lines(file_path, start, end):
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        for line in f:
+            if remaining <= 0:
+                return
+            if len(line) > remaining:
+                line = line[:remaining]
+            remaining -= len(line)
+            yield line
+
+def iter_range_records(file_path, ext, start, end):
+    """Yield record (teks kartu / baris tanpa newline) di rentang byte [start, end) secara streaming."""
+    lines = _iter_range_lines(file_path, start, end)
+    if ext == ".vcf":
+        for card in parse_vcards(line.decode("utf-8", errors="replace") for line in lines):
+            yield card.raw
+    else:
+        for line in lines:
+            yield line.rstrip(b"\r\n").decode("utf-8")
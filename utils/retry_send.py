@@ -1,15 +1,32 @@
 import asyncio
-from aiogram.types import FSInputFile
+from aiogram.types import FSInputFile, BufferedInputFile
 from aiogram.exceptions import TelegramNetworkError
 
+def as_input_file(source, filename):
+    """Isi file dalam bytes dikirim dari memori, selain itu dianggap path file di disk."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return BufferedInputFile(bytes(source), filename=filename)
+    return FSInputFile(source, filename=filename)
+
 async def retry_send_document(message, file_path, filename, max_retry=5, delay=2):
     """
     Kirim dokumen ke Telegram dengan retry jika timeout/network error.
+    file_path boleh berupa path file atau isi file (bytes, hasil SpooledOutput.result()).
     Tidak ada pesan ke user saat retry, hanya jika sudah gagal 5x.
     """
+    return await _send_with_retry(message, as_input_file(file_path, filename), max_retry, delay)
+
+async def retry_resend_document(message, file_id, max_retry=5, delay=2):
+    """
+    Kirim ulang dokumen yang sudah ada di Telegram lewat file_id, tanpa upload.
+    Nama file tetap nama aslinya (Bot API tidak bisa ganti nama file lewat file_id).
+    """
+    return await _send_with_retry(message, file_id, max_retry, delay)
+
+async def _send_with_retry(message, document, max_retry, delay):
     for attempt in range(1, max_retry + 1):
         try:
-            await message.answer_document(FSInputFile(file_path, filename=filename))
+            await message.answer_document(document)
             return True
         except (asyncio.TimeoutError, TelegramNetworkError):
             if attempt == max_retry:
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from collections import deque
+from config import JOB_MAX_ACTIVE, JOB_MAX_PER_USER
+
+class JobScheduler:
+    """
+    Antrian proses file dengan batas global, batas per user dan giliran round-robin antar user.
+    User yang baru kirim job tidak perlu menunggu semua job user lain yang lebih dulu antre.
+    """
+
+    def __init__(self, max_active=JOB_MAX_ACTIVE, max_per_user=JOB_MAX_PER_USER):
+        self.max_active = max(1, max_active)
+        self.max_per_user = max(1, max_per_user)
+        self._waiting = {}       # user_id -> deque future tiket
+        self._running = {}       # user_id -> jumlah job berjalan
+        self._rotation = deque()  # urutan giliran user
+        self._active = 0
+
+    def _dispatch(self):
+        """Beri slot ke tiket berikutnya selama masih ada slot global."""
+        while self._active < self.max_active:
+            for _ in range(len(self._rotation)):
+                user_id = self._rotation[0]
+                self._rotation.rotate(-1)
+                queue = self._waiting.get(user_id)
+                if queue and self._running.get(user_id, 0) < self.max_per_user:
+                    ticket = queue.popleft()
+                    if not queue:
+                        del self._waiting[user_id]
+                        self._rotation.remove(user_id)
+                    self._running[user_id] = self._running.get(user_id, 0) + 1
+                    self._active += 1
+                    ticket.set_result(True)
+                    break
+            else:
+                return
+
+    def _release(self, user_id):
+        self._active -= 1
+        self._running[user_id] -= 1
+        if not self._running[user_id]:
+            del self._running[user_id]
+        self._dispatch()
+
+    def _drop(self, user_id, ticket):
+        queue = self._waiting.get(user_id)
+        if queue and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                del self._waiting[user_id]
+                self._rotation.remove(user_id)
+
+    def position(self, user_id, ticket):
+        """Perkiraan posisi antrian (1 = berikutnya) dengan simulasi giliran round-robin."""
+        queues = [list(self._waiting.get(uid, ())) for uid in self._rotation]
+        pos = 0
+        depth = 0
+        while any(depth < len(q) for q in queues):
+            for q in queues:
+                if depth < len(q):
+                    pos += 1
+                    if q[depth] is ticket:
+                        return pos
+            depth += 1
+        return pos
+
+    async def run(self, user_id, func, *args, notify=None, **kwargs):
+        """
+        Tunggu slot lalu jalankan coroutine func(*args, **kwargs).
+        notify(posisi) dipanggil sekali jika job harus antre.
+        """
+        ticket = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(user_id, deque()).append(ticket)
+        if user_id not in self._rotation:
+            self._rotation.append(user_id)
+        self._dispatch()
+        if not ticket.done() and notify is not None:
+            try:
+                await notify(self.position(user_id, ticket))
+            except Exception as e:
+                logging.error(f"Gagal kirim posisi antrian: {e}")
+        try:
+            await ticket
+        except asyncio.CancelledError:
+            if ticket.done() and not ticket.cancelled():
+                self._release(user_id)
+            else:
+                self._drop(user_id, ticket)
+            raise
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            self._release(user_id)
+
+scheduler = JobScheduler()
+
+async def run_queued(message, func, *args, **kwargs):
+    """Jalankan proses handler lewat scheduler, posisi antrian dikirim ke user."""
+    async def notify(position):
+        bot_msg = f"⏳ Antrian ke-{position}, file kamu diproses sebentar lagi..."
+        await message.answer(bot_msg)
+        logging.info(f"bot: {bot_msg}")
+    return await scheduler.run(message.from_user.id, func, *args, notify=notify, **kwargs)
@@ -0,0 +1,140 @@
+import contextlib
+import os
+from openpyxl import Workbook, load_workbook
+from utils.number_cleaner import normalize_many
+
+# Jumlah baris yang dinormalisasi sekaligus per kolom
+ROW_BATCH = 10_000
+
+def _cell_value(value):
+    """Samakan dengan pandas: float bulat jadi int supaya tidak muncul '.0' di nomor."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def _is_blank(row):
+    return all(v is None or (isinstance(v, str) and not v.strip()) for v in row)
+
+def _iter_xls_sheets(file_path, first_only):
+    """Fallback .xls (tidak didukung openpyxl) lewat pandas."""
+    import pandas as pd
+    sheets = pd.read_excel(file_path, sheet_name=0 if first_only else None, header=None)
+    if first_only:
+        sheets = {"Sheet1": sheets}
+    for name, df in sheets.items():
+        df = df.astype(object).where(df.notna(), None)
+        yield name, (tuple(row) for row in df.itertuples(index=False, name=None))
+
+def iter_sheets(file_path, first_only=False):
+    """
+    Buka workbook mode read-only dan yield (nama sheet, iterator baris).
+    Tiap baris berupa tuple nilai sel (values_only), baris kosong dilewati.
+    """
+    if os.path.splitext(file_path.lower())[1] == ".xls":
+        sheets = _iter_xls_sheets(file_path, first_only)
+        wb = None
+    else:
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+        worksheets = wb.worksheets[:1] if first_only else wb.worksheets
+        sheets = ((ws.title, ws.iter_rows(values_only=True)) for ws in worksheets)
+    try:
+        for name, rows in sheets:
+            yield name, (tuple(_cell_value(v) for v in row) for row in rows if not _is_blank(row))
+    finally:
+        if wb is not None:
+            wb.close()
+
+def iter_rows(file_path, first_only=True):
+    """Yield semua baris (termasuk header) dari sheet pertama atau semua sheet."""
+    for _, rows in iter_sheets(file_path, first_only=first_only):
+        yield from rows
+
+def count_sheet_rows(file_path):
+    """
+    Jumlah baris data (tanpa header) sheet pertama. Untuk xlsx dipakai dimensi sheet
+    (tanpa membaca sel, baris kosong ikut terhitung); jika dimensi tidak ada, baris dihitung satu per satu.
+    """
+    if os.path.splitext(file_path.lower())[1] != ".xls":
+        wb = load_workbook(file_path, read_only=True)
+        try:
+            ws = wb.worksheets[0]
+            if ws.max_row is not None and ws.min_row is not None:
+                return max(ws.max_row - ws.min_row, 0)
+        finally:
+            wb.close()
+    return max(sum(1 for _ in iter_rows(file_path)) - 1, 0)
+
+def _sheet_count(file_path):
+    if os.path.splitext(file_path.lower())[1] == ".xls":
+        import pandas as pd
+        return len(pd.ExcelFile(file_path).sheet_names)
+    wb = load_workbook(file_path, read_only=True)
+    try:
+        return len(wb.sheetnames)
+    finally:
+        wb.close()
+
+@contextlib.contextmanager
+def _open_sheet(file_path, index):
+    """Iterator baris mentah sheet ke-index, baris kosong tetap ada (sama seperti pd.read_excel)."""
+    if os.path.splitext(file_path.lower())[1] == ".xls":
+        import pandas as pd
+        df = pd.read_excel(file_path, sheet_name=index, header=None)
+        df = df.astype(object).where(df.notna(), None)
+        yield (tuple(row) for row in df.itertuples(index=False, name=None))
+        return
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        yield wb.worksheets[index].iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+def _iter_column_numbers(file_path, index, col, others=None):
+    """
+    Yield nomor valid satu kolom sheet per batch (baris pertama = header, dilewati).
+    others (set) diisi index kolom lain yang punya nilai, untuk dibaca di pass berikutnya.
+    """
+    with _open_sheet(file_path, index) as rows:
+        next(rows, None)  # header
+        batch = []
+        for row in rows:
+            if others is not None and len(row) > 1:
+                others.update(i for i, v in enumerate(row) if v is not None and i != col)
+            if col < len(row) and row[col] is not None:
+                batch.append(str(_cell_value(row[col])))
+                if len(batch) >= ROW_BATCH:
+                    yield from normalize_many(batch)[0]
+                    batch = []
+        if batch:
+            yield from normalize_many(batch)[0]
+
+def iter_numbers_from_sheets(file_path, first_only=False):
+    """
+    Stream sel spreadsheet langsung ke normalizer nomor.
+    Baris pertama tiap sheet dianggap header (sama seperti pd.read_excel), walaupun kosong.
+    Urutan hasil per sheet tetap kolom demi kolom seperti versi DataFrame: kolom pertama
+    langsung di-stream, kolom lain yang berisi nilai dibaca satu per satu di pass berikutnya,
+    jadi memori tidak ikut besar dengan ukuran sheet.
+    """
+    total = 1 if first_only else _sheet_count(file_path)
+    for index in range(total):
+        others = set()
+        yield from _iter_column_numbers(file_path, index, 0, others)
+        for col in sorted(others):
+            yield from _iter_column_numbers(file_path, index, col)
+
+def write_rows(output_path, rows, header=None, sheet_name="Sheet1"):
+    """
+    Tulis baris ke xlsx baru dengan workbook write-only (streaming). Return jumlah baris data.
+    output_path boleh path atau file object (mis. SpooledOutput).
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    if header is not None:
+        ws.append(list(header))
+    total = 0
+    for row in rows:
+        ws.append(list(row))
+        total += 1
+    wb.save(output_path)
+    return total
@@ -0,0 +1,215 @@
+import asyncio
+import copy
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder
+from aiogram.fsm.storage.memory import MemoryStorage
+from config import STORAGE_BACKEND, STORAGE_PATH, STORAGE_TTL, STORAGE_FLUSH_INTERVAL, REDIS_URL
+from utils.upload import discard_parsed, restore_cached_uploads
+
+# Sesi kedaluwarsa dicek tiap interval ini (detik)
+EXPIRE_CHECK_INTERVAL = 60
+
+def _session_files(data):
+    return [item[0] for item in data.get("files", []) or []]
+
+def _remove_session_files(data):
+    """Hapus file upload yang masih tercatat di state sesi yang dibuang."""
+    paths = _session_files(data)
+    if data.get("delete_list"):
+        paths.append(data["delete_list"])
+    discard_parsed(paths)
+    for path in paths:
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+                logging.info(f"File upload sesi kedaluwarsa dihapus: {path}")
+        except Exception as e:
+            logging.error(f"Gagal hapus file upload: {path} ({e})")
+
+class SQLiteStorage(BaseStorage):
+    """
+    Storage FSM di SQLite (mode WAL) supaya sesi tidak hilang saat bot restart.
+    Semua sesi aktif disimpan di cache memori; perubahan ditulis ke database per batch
+    tiap flush_interval detik. Sesi yang diam lebih dari ttl detik dibuang beserta file upload-nya
+    oleh task berkala (start), jadi tetap jalan walau bot sedang tidak menerima pesan.
+    """
+
+    def __init__(self, path=STORAGE_PATH, ttl=STORAGE_TTL, flush_interval=STORAGE_FLUSH_INTERVAL):
+        self.path = path
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_business_connection_id=True, with_destiny=True)
+        self._cache = {}   # key -> [state, data, waktu update terakhir]
+        self._dirty = set()
+        self._flusher = None
+        self._expirer = None
+        self._db_lock = threading.Lock()
+        self._db = self._connect()
+        self._load()
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS fsm ("
+            "key TEXT PRIMARY KEY, state TEXT, data TEXT NOT NULL, updated REAL NOT NULL)"
+        )
+        return db
+
+    def _load(self):
+        """Muat sesi yang belum kedaluwarsa ke cache, sesi lama langsung dibuang."""
+        now = time.time()
+        expired = []
+        for key, state, data, updated in self._db.execute("SELECT key, state, data, updated FROM fsm"):
+            data = json.loads(data)
+            if now - updated > self.ttl:
+                expired.append(key)
+                _remove_session_files(data)
+            else:
+                self._cache[key] = [state, data, updated]
+                # Upload dari cache parsing di sesi yang masih aktif tetap di-pin setelah restart
+                restore_cached_uploads(_session_files(data))
+        if expired:
+            with self._db:
+                self._db.executemany("DELETE FROM fsm WHERE key = ?", [(k,) for k in expired])
+        logging.info(f"Storage FSM: {len(self._cache)} sesi dimuat, {len(expired)} sesi kedaluwarsa dihapus")
+
+    def _entry(self, key):
+        entry = self._cache.get(self.key_builder.build(key))
+        if entry is not None:
+            entry[2] = time.time()
+        return entry
+
+    def _write(self, key, state=None, data=None, set_state=False, set_data=False):
+        name = self.key_builder.build(key)
+        entry = self._cache.get(name) or [None, {}, 0.0]
+        if set_state:
+            entry[0] = state
+        if set_data:
+            # File yang tidak lagi tercatat di sesi (mis. selesai /done): parsing awal dan pin
+            # cache-nya dilepas, termasuk pin yang dipulihkan saat bot start
+            dropped = set(_session_files(entry[1])) - set(_session_files(data))
+            entry[1] = data
+            if dropped:
+                discard_parsed(dropped)
+        entry[2] = time.time()
+        if entry[0] is None and not entry[1]:
+            # Sesi kosong (state.clear) tidak perlu disimpan
+            self._cache.pop(name, None)
+        else:
+            self._cache[name] = entry
+        self._dirty.add(name)
+        self._schedule_flush()
+
+    async def set_state(self, key, state=None):
+        self._write(key, state=state.state if isinstance(state, State) else state, set_state=True)
+
+    async def get_state(self, key):
+        entry = self._entry(key)
+        return entry[0] if entry else None
+
+    async def set_data(self, key, data):
+        self._write(key, data=copy.deepcopy(dict(data)), set_data=True)
+
+    async def get_data(self, key):
+        entry = self._entry(key)
+        return copy.deepcopy(entry[1]) if entry else {}
+
+    def start(self):
+        """Mulai task berkala pembuang sesi kedaluwarsa (dipanggil dari event loop bot)."""
+        if self._expirer is None or self._expirer.done():
+            self._expirer = asyncio.create_task(self._expire_loop())
+
+    async def _expire_loop(self):
+        while True:
+            await asyncio.sleep(EXPIRE_CHECK_INTERVAL)
+            try:
+                self._expire()
+            except Exception as e:
+                logging.error(f"Gagal hapus sesi kedaluwarsa: {e}")
+            if self._dirty:
+                self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        # Ulangi selama masih ada perubahan yang masuk saat batch sebelumnya ditulis
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await asyncio.to_thread(self._flush_rows, self._take_dirty())
+            except Exception as e:
+                logging.error(f"Gagal simpan storage FSM: {e}")
+            if not self._dirty:
+                return
+
+    def _expire(self):
+        now = time.time()
+        for name, entry in list(self._cache.items()):
+            if now - entry[2] > self.ttl:
+                del self._cache[name]
+                self._dirty.add(name)
+                _remove_session_files(entry[1])
+
+    def _take_dirty(self):
+        """Ambil snapshot baris yang berubah (dipanggil di event loop sebelum ditulis di thread)."""
+        rows = []
+        for name in self._dirty:
+            entry = self._cache.get(name)
+            if entry is None:
+                rows.append((name, None))
+            else:
+                rows.append((name, (entry[0], json.dumps(entry[1], ensure_ascii=False), entry[2])))
+        self._dirty.clear()
+        return rows
+
+    def _flush_rows(self, rows):
+        if not rows:
+            return
+        with self._db_lock, self._db:
+            self._db.executemany(
+                "DELETE FROM fsm WHERE key = ?",
+                [(name,) for name, row in rows if row is None],
+            )
+            self._db.executemany(
+                "INSERT INTO fsm (key, state, data, updated) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET state = excluded.state, data = excluded.data, updated = excluded.updated",
+                [(name, *row) for name, row in rows if row is not None],
+            )
+
+    async def close(self):
+        for task in (self._expirer, self._flusher):
+            if task is not None and not task.done():
+                task.cancel()
+        # Lock memastikan batch yang sedang ditulis di thread selesai dulu
+        self._flush_rows(self._take_dirty())
+        with self._db_lock:
+            self._db.close()
+
+def create_storage():
+    """Buat storage FSM sesuai STORAGE_BACKEND: sqlite (default), redis, atau memory."""
+    backend = STORAGE_BACKEND.lower()
+    if backend == "redis":
+        # Butuh paket redis (opsional, tidak ada di requirements.txt: pip install redis);
+        # bisa juga server yang kompatibel (Valkey, KeyDB, Dragonfly)
+        try:
+            from aiogram.fsm.storage.redis import RedisStorage
+        except ImportError as e:
+            raise RuntimeError("STORAGE_BACKEND=redis butuh paket redis: pip install redis") from e
+        logging.info(f"Storage FSM: redis ({REDIS_URL})")
+        return RedisStorage.from_url(REDIS_URL, state_ttl=STORAGE_TTL, data_ttl=STORAGE_TTL)
+    if backend == "memory":
+        return MemoryStorage()
+    storage = SQLiteStorage()
+    storage.start()
+    return storage
@@ -0,0 +1,225 @@
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from config import DOWNLOAD_CONCURRENCY, PARSE_MAX_ACTIVE, PARSE_MAX_PER_USER
+from utils.executor import run_job
+from utils.file import file_parser
+from utils.parse_cache import parse_job, load_job, lookup, remember, pin, unpin, cached_path, cached_key
+from utils.scheduler import JobScheduler
+
+DATA_DIR = "data"
+
+# Batasi jumlah download yang berjalan bersamaan untuk semua user
+_download_sem = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+# Lock per percakapan supaya append ke state tidak saling timpa saat banyak file masuk sekaligus.
+# state.key -> [lock, jumlah pemakai]; entry dibuang begitu tidak ada yang memegang / menunggu lock.
+_state_locks = {}
+# Parsing awal per file upload: file_path -> {"time", "task" (atau None), "session" (state.key),
+# "running", "unique_id"}
+_parsed = {}
+# Upload yang diambil dari cache parsing: cached_path -> state.key (None jika dipulihkan dari
+# storage saat bot start). Entry cache-nya di-pin selama path masih tercatat di sesi.
+_cached_uploads = {}
+# Hasil parsing yang tidak pernah diambil (user tidak /done) dibuang setelah ini (detik)
+PARSED_TTL = 30 * 60
+# Parsing awal punya antrian sendiri (batas global, per user, round-robin) supaya upload banyak file
+# tidak memenuhi worker di depan job user lain. Dipisah dari scheduler utama karena proses /done
+# (yang memegang slot user di scheduler utama) menunggu hasil parsing awal ini.
+_parse_scheduler = JobScheduler(max_active=PARSE_MAX_ACTIVE, max_per_user=PARSE_MAX_PER_USER)
+
+@contextlib.asynccontextmanager
+async def _state_lock(state):
+    key = state.key
+    entry = _state_locks.get(key)
+    if entry is None:
+        entry = _state_locks[key] = [asyncio.Lock(), 0]
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            del _state_locks[key]
+
+def _prune_parsed():
+    now = time.monotonic()
+    expired = [path for path, entry in _parsed.items() if now - entry["time"] > PARSED_TTL]
+    # Hanya hasil parsing yang dibuang; pin upload dari cache tetap selama path masih di sesi
+    for path in expired:
+        _drop_entry(_parsed.pop(path))
+
+async def _parse(file_path, unique_id, parser, derive, *args):
+    """derive(nomor file menurut parser, *args) di job executor lewat cache parsing."""
+    key = cached_key(file_path)
+    if key is not None:
+        return await run_job(load_job, key, derive, *args)
+    key, size, result = await run_job(parse_job, file_path, unique_id, parser, derive, *args)
+    remember(unique_id, key, size)
+    return result
+
+def _start_parse(entry, user_id, file_path, parser, derive, *args):
+    """
+    Mulai parsing file di job executor tanpa menunggu hasilnya (lewat cache parsing).
+    Parsing antre di _parse_scheduler, jadi satu user tidak bisa memakai semua worker.
+    """
+    async def job():
+        entry["running"] = True
+        return await _parse(file_path, entry["unique_id"], parser, derive, *args)
+
+    task = asyncio.create_task(_parse_scheduler.run(user_id, job))
+    # Error diambil saat hasil dipakai, jangan sampai muncul "exception never retrieved"
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    entry["task"] = task
+
+def _drop_entry(entry):
+    if entry["task"] is not None:
+        entry["task"].cancel()
+
+async def take_parsed(file_path, parser, derive, *args):
+    """
+    Ambil derive(nomor file menurut parser, *args): hasil parsing awal jika sudah dimulai saat
+    upload, kalau belum parsing sekarang (lewat cache parsing). parser harus sama dengan saat upload.
+    Parsing awal yang masih antre dibatalkan dan file langsung diparsing (pemanggil sudah dapat
+    slot di scheduler utama). Jika parsing awal gagal, file diparsing ulang sekali.
+    """
+    entry = _parsed.pop(file_path, None)
+    unique_id = None
+    try:
+        if entry is not None:
+            unique_id = entry["unique_id"]
+            if entry["task"] is not None and entry["running"]:
+                try:
+                    return await entry["task"]
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logging.error(f"Parsing awal {file_path} gagal, ulangi: {e}")
+            elif entry["task"] is not None:
+                entry["task"].cancel()
+        return await _parse(file_path, unique_id, parser, derive, *args)
+    finally:
+        # Hasil sudah diambil (file tidak dibaca lagi), pin entry cache tidak perlu ditahan sampai sesi selesai
+        discard_parsed([file_path])
+
+def is_cached(file_path):
+    """True jika upload diambil dari cache parsing (tidak ada file di disk)."""
+    return cached_key(file_path) is not None
+
+def discard_parsed(file_paths):
+    """
+    Lepas file upload yang sudah tidak dipakai sesi: hasil parsing awal dibuang dan
+    pin entry cache upload dari cache parsing dilepas.
+    """
+    for path in file_paths:
+        entry = _parsed.pop(path, None)
+        if entry is not None:
+            _drop_entry(entry)
+        if path in _cached_uploads:
+            del _cached_uploads[path]
+            unpin(cached_key(path))
+
+def restore_cached_uploads(file_paths):
+    """
+    Pin ulang entry cache upload yang masih tercatat di sesi tersimpan (dipanggil storage saat bot
+    start), supaya entry-nya tidak dibuang sebelum sesi itu /done atau kedaluwarsa.
+    """
+    for path in file_paths:
+        if is_cached(path) and path not in _cached_uploads:
+            _cached_uploads[path] = None
+            pin(cached_key(path))
+
+async def sync_session(state):
+    """
+    Buang parsing awal milik sesi ini yang filenya sudah tidak ada di state
+    (sesi selesai, di-reset /start, pindah perintah lain, dll). Dipanggil setelah tiap update.
+    """
+    key = state.key
+    if not any(entry["session"] == key for entry in _parsed.values()) and key not in _cached_uploads.values():
+        return
+    async with _state_lock(state):
+        data = await state.get_data()
+        live = {item[0] for item in data.get("files", []) or []}
+        owned = [path for path, entry in _parsed.items() if entry["session"] == key]
+        owned += [path for path, session in _cached_uploads.items() if session == key]
+        discard_parsed([path for path in owned if path not in live])
+
+async def download_document(message, bot=None):
+    """Download dokumen dari message ke DATA_DIR dengan nama unik (dibatasi semaphore global). Return path file."""
+    bot = bot or message.bot
+    file = message.document
+    filename, ext_real = os.path.splitext(file.file_name)
+    timestamp = int(time.time() * 1000)
+    unique_name = f"{filename}_{timestamp}_{message.message_id}{ext_real}"
+    file_path = os.path.join(DATA_DIR, unique_name)
+    async with _download_sem:
+        await bot.download(file, destination=file_path)
+    return file_path
+
+async def receive_upload(message, state, bot=None, parser=None, derive=None, derive_args=(), preparse=True):
+    """
+    Download dokumen dari message lalu tambahkan ke state["files"] secara atomik.
+    - Download dibatasi semaphore global, beberapa file dari satu user bisa diunduh paralel.
+    - derive (fungsi sync, argumen pertama PackedNumbers semua nomor file menurut parser, lihat
+      utils.file.NUMBER_PARSERS; default sesuai tipe file, file_parser): hasil derive(nomor, *derive_args) langsung disiapkan di executor
+      setelah download selesai (kecuali preparse=False), diambil nanti lewat take_parsed.
+    - Jika nomor file yang sama (file_unique_id) dengan parser yang sama sudah ada di cache parsing,
+      file tidak didownload; path cached_path dicatat di state sebagai ganti file upload (lihat
+      is_cached). Entry cache-nya di-pin selama path itu masih tercatat di sesi.
+    Return jumlah file di state setelah file ini ditambahkan, atau 0 jika upload dibatalkan
+    (state sudah ditandai file_error / sudah di-reset).
+    """
+    file = message.document
+    if derive is not None and parser is None:
+        parser = file_parser(os.path.splitext(file.file_name.lower())[1])
+    key = lookup(file.file_unique_id, parser) if derive is not None else None
+    if key is None:
+        file_path = await download_document(message, bot)
+    else:
+        # Di-pin sebelum menunggu lock supaya entry tidak dibuang sebelum dicatat di sesi
+        pin(key)
+        file_path = cached_path(key, message.message_id)
+        logging.info(f"File {file.file_name} diambil dari cache parsing, tidak didownload")
+    async with _state_lock(state):
+        data = await state.get_data()
+        # State bisa berubah selama download (format salah di file lain, /start, dll)
+        if data.get("file_error") or "files" not in data:
+            if key is not None:
+                unpin(key)
+            else:
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    pass
+            return 0
+        files = data.get("files", [])
+        logs = data.get("logs", [])
+        # file_id Telegram per file, untuk kirim ulang file yang tidak berubah tanpa upload
+        file_ids = data.get("file_ids", {})
+        files.append((file_path, file.file_name, message.message_id))
+        logs.append((message.message_id, f"bot: File {file.file_name} diterima"))
+        file_ids[file_path] = file.file_id
+        await state.update_data(files=files, logs=logs, file_ids=file_ids)
+        if key is not None:
+            _cached_uploads[file_path] = state.key
+        if derive is not None and (preparse or key is not None):
+            _prune_parsed()
+            entry = {
+                "time": time.monotonic(), "task": None, "session": state.key, "running": False,
+                "unique_id": file.file_unique_id,
+            }
+            _parsed[file_path] = entry
+            _start_parse(entry, message.from_user.id, file_path, parser, derive, *derive_args)
+    return len(files)
+
+async def mark_file_error(state, **extra):
+    """
+    Tandai state error (format salah) secara atomik terhadap upload yang sedang berjalan.
+    Parsing awal file sesi ini dibatalkan. extra: field state lain yang ikut diubah (mis. ext=None di /merge).
+    """
+    async with _state_lock(state):
+        data = await state.get_data()
+        discard_parsed([item[0] for item in data.get("files", []) or []])
+        await state.update_data(files=[], logs=[], file_error=True, **extra)
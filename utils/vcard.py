@@ -0,0 +1,82 @@
+from collections import namedtuple
+
+# Satu kontak hasil parsing: teks kartu asli (tanpa newline di ujung), nama (FN) dan daftar nomor TEL mentah
+VCard = namedtuple("VCard", ["raw", "fn", "tels"])
+
+def _property(line):
+    """
+    Pecah satu baris (sudah di-unfold) jadi (nama property, value).
+    Prefix grup seperti "item1.TEL" dibuang, parameter (";TYPE=CELL") diabaikan.
+    """
+    head, sep, _ = line.partition(":")
+    if not sep:
+        return None, None
+    name = head.split(";", 1)[0].strip().upper()
+    if "." in name:
+        name = name.rsplit(".", 1)[1]
+    return name, line
+
+def _parse_card(lines):
+    """Bangun VCard dari list baris mentah satu kartu."""
+    fn = None
+    tels = []
+    logical = None
+    # Gabungkan baris lanjutan (folded line: diawali spasi/tab) sebelum dibaca
+    for line in lines + [None]:
+        if line is not None and line[:1] in (" ", "\t") and logical is not None:
+            logical += line[1:]
+            continue
+        if logical is not None:
+            name, value = _property(logical)
+            if name == "TEL":
+                # Sama seperti sebelumnya: nomor = bagian setelah ":" terakhir
+                tels.append(value.split(":")[-1].strip())
+            elif name == "FN" and fn is None:
+                fn = value.split(":", 1)[1].strip()
+        logical = line
+    return VCard("\n".join(lines).strip(), fn, tels)
+
+def parse_vcards(lines):
+    """
+    Tokenizer vCard incremental dari iterable baris (file handle, list, dll).
+    Yield VCard satu per satu, memori hanya sebesar satu kartu.
+    Kartu dimulai di baris BEGIN:VCARD dan selesai di END:VCARD (atau BEGIN berikutnya).
+    """
+    card = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        marker = line.strip().upper()
+        if marker.startswith("BEGIN:VCARD"):
+            if card:
+                yield _parse_card(card)
+            card = [line.strip()]
+            continue
+        if card is None:
+            # Baris di luar kartu (sebelum BEGIN pertama / setelah END) diabaikan
+            continue
+        card.append(line)
+        if marker.startswith("END:VCARD"):
+            yield _parse_card(card)
+            card = None
+    if card:
+        yield _parse_card(card)
+
+def iter_vcards(file_path, encoding="utf-8"):
+    """Baca file .vcf secara streaming (buffered), yield VCard per kontak."""
+    with open(file_path, "r", encoding=encoding, errors="replace", newline="") as f:
+        yield from parse_vcards(f)
+
+def iter_vcf_numbers(file_path):
+    """Yield semua nomor TEL mentah dari file .vcf (belum divalidasi)."""
+    for card in iter_vcards(file_path):
+        yield from card.tels
+
+def write_vcards(f, cards):
+    """Tulis kartu ke file handle teks, dipisah newline seperti format output lama. Return jumlah kartu."""
+    total = 0
+    for card in cards:
+        if total:
+            f.write("\n")
+        f.write(card.raw if isinstance(card, VCard) else card)
+        total += 1
+    return total